@@ -56,15 +56,19 @@ def upgrade() -> None:
     op.create_table('search_helpers',
     sa.Column('doc_id', sa.String(length=255), nullable=False),
     sa.Column('title', sa.Text(), nullable=False),
-    sa.Column('normalized_text', postgresql.TSVECTOR(), nullable=True),
     sa.Column('enumbers', postgresql.ARRAY(sa.String()), nullable=False),
     sa.Column('normalized_title', sa.Text(), nullable=True),
     sa.Column('last_seen_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
     sa.PrimaryKeyConstraint('doc_id')
     )
-    op.create_index('ix_search_helpers_normalized_text', 'search_helpers', ['normalized_text'], unique=False, postgresql_using='gin')
+    # Full-text vector is computed by PostgreSQL, never written by the application
+    op.execute(
+        "ALTER TABLE search_helpers ADD COLUMN normalized_text tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(normalized_title, '') || ' ' || coalesce(title, ''))) STORED"
+    )
+    op.execute('CREATE INDEX ix_search_helpers_normalized_text ON search_helpers USING GIN (normalized_text)')
     op.create_index('ix_search_helpers_enumbers', 'search_helpers', ['enumbers'], unique=False, postgresql_using='gin')
-    op.create_index('ix_search_helpers_normalized_title', 'search_helpers', ['normalized_title'], unique=False, postgresql_using='gin')
+    op.create_index('ix_search_helpers_normalized_title', 'search_helpers', ['normalized_title'], unique=False, postgresql_using='gin', postgresql_ops={'normalized_title': 'gin_trgm_ops'})
     op.create_index('ix_search_helpers_last_seen', 'search_helpers', ['last_seen_at'], unique=False)
     
     # Create settings table
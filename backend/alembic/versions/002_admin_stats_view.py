@@ -0,0 +1,37 @@
+"""Admin stats materialized view
+
+Revision ID: 002
+Revises: 001
+Create Date: 2024-02-01 00:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Single-row rollup backing /api/admin/stats, refreshed in the background
+    op.execute("""
+        CREATE MATERIALIZED VIEW mv_admin_stats AS
+        SELECT
+            1 AS id,
+            (SELECT count(*) FROM users) AS total_users,
+            (SELECT count(*) FROM users WHERE is_active) AS active_users,
+            (SELECT count(*) FROM search_helpers) AS total_documents,
+            (SELECT count(*) FROM audits) AS total_audits,
+            (SELECT count(*) FROM audits
+                WHERE action = 'upload' AND created_at >= now() - interval '7 days') AS recent_uploads,
+            (SELECT count(*) FROM audits
+                WHERE action = 'download' AND created_at >= now() - interval '7 days') AS recent_downloads
+    """)
+    # REFRESH ... CONCURRENTLY requires a unique index on a plain column
+    op.execute('CREATE UNIQUE INDEX ix_mv_admin_stats_id ON mv_admin_stats (id)')
+
+
+def downgrade() -> None:
+    op.execute('DROP MATERIALIZED VIEW IF EXISTS mv_admin_stats')
@@ -0,0 +1,50 @@
+"""Generate normalized_title in the database
+
+Revision ID: 003
+Revises: 002
+Create Date: 2024-02-15 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # unaccent() is only STABLE; generated columns need an IMMUTABLE wrapper
+    op.execute("""
+        CREATE OR REPLACE FUNCTION immutable_unaccent(text) RETURNS text
+        AS $$ SELECT public.unaccent('public.unaccent', $1) $$
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    """)
+    
+    # normalized_text depends on normalized_title and a generated column may not
+    # reference another one, so both are rebuilt from title
+    op.execute('ALTER TABLE search_helpers DROP COLUMN normalized_text, DROP COLUMN normalized_title')
+    op.execute(
+        "ALTER TABLE search_helpers ADD COLUMN normalized_title text "
+        "GENERATED ALWAYS AS (lower(immutable_unaccent(title))) STORED"
+    )
+    op.execute(
+        "ALTER TABLE search_helpers ADD COLUMN normalized_text tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('simple', lower(immutable_unaccent(title)) || ' ' || title)) STORED"
+    )
+    op.execute('CREATE INDEX ix_search_helpers_normalized_title ON search_helpers USING GIN (normalized_title gin_trgm_ops)')
+    op.execute('CREATE INDEX ix_search_helpers_normalized_text ON search_helpers USING GIN (normalized_text)')
+
+
+def downgrade() -> None:
+    op.execute('ALTER TABLE search_helpers DROP COLUMN normalized_text, DROP COLUMN normalized_title')
+    op.add_column('search_helpers', sa.Column('normalized_title', sa.Text(), nullable=True))
+    op.execute(
+        "ALTER TABLE search_helpers ADD COLUMN normalized_text tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(normalized_title, '') || ' ' || coalesce(title, ''))) STORED"
+    )
+    op.execute('CREATE INDEX ix_search_helpers_normalized_title ON search_helpers USING GIN (normalized_title gin_trgm_ops)')
+    op.execute('CREATE INDEX ix_search_helpers_normalized_text ON search_helpers USING GIN (normalized_text)')
+    op.execute('DROP FUNCTION IF EXISTS immutable_unaccent(text)')
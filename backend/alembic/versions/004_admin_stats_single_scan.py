@@ -0,0 +1,65 @@
+"""Admin stats view with a single pass over audits
+
+Revision ID: 004
+Revises: 003
+Create Date: 2024-02-20 00:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Users and audits are each scanned once, counters come from FILTER clauses
+    op.execute('DROP MATERIALIZED VIEW IF EXISTS mv_admin_stats')
+    op.execute("""
+        CREATE MATERIALIZED VIEW mv_admin_stats AS
+        SELECT
+            1 AS id,
+            u.total_users,
+            u.active_users,
+            (SELECT count(*) FROM search_helpers) AS total_documents,
+            a.total_audits,
+            a.recent_uploads,
+            a.recent_downloads
+        FROM (
+            SELECT
+                count(*) AS total_users,
+                count(*) FILTER (WHERE is_active) AS active_users
+            FROM users
+        ) u, (
+            SELECT
+                count(*) AS total_audits,
+                count(*) FILTER (
+                    WHERE action = 'upload' AND created_at >= now() - interval '7 days'
+                ) AS recent_uploads,
+                count(*) FILTER (
+                    WHERE action = 'download' AND created_at >= now() - interval '7 days'
+                ) AS recent_downloads
+            FROM audits
+        ) a
+    """)
+    op.execute('CREATE UNIQUE INDEX ix_mv_admin_stats_id ON mv_admin_stats (id)')
+
+
+def downgrade() -> None:
+    op.execute('DROP MATERIALIZED VIEW IF EXISTS mv_admin_stats')
+    op.execute("""
+        CREATE MATERIALIZED VIEW mv_admin_stats AS
+        SELECT
+            1 AS id,
+            (SELECT count(*) FROM users) AS total_users,
+            (SELECT count(*) FROM users WHERE is_active) AS active_users,
+            (SELECT count(*) FROM search_helpers) AS total_documents,
+            (SELECT count(*) FROM audits) AS total_audits,
+            (SELECT count(*) FROM audits
+                WHERE action = 'upload' AND created_at >= now() - interval '7 days') AS recent_uploads,
+            (SELECT count(*) FROM audits
+                WHERE action = 'download' AND created_at >= now() - interval '7 days') AS recent_downloads
+    """)
+    op.execute('CREATE UNIQUE INDEX ix_mv_admin_stats_id ON mv_admin_stats (id)')
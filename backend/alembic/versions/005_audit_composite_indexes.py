@@ -0,0 +1,31 @@
+"""Composite indexes for paginated audit queries
+
+Revision ID: 005
+Revises: 004
+Create Date: 2024-03-01 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Serve "filter, ORDER BY created_at DESC LIMIT n" straight from the index
+    op.create_index('ix_audits_action_created', 'audits', ['action', sa.text('created_at DESC')], unique=False)
+    op.create_index('ix_audits_user_created', 'audits', ['user_id', sa.text('created_at DESC')], unique=False)
+    op.create_index('ix_audits_doc_created', 'audits', ['doc_id', sa.text('created_at DESC')], unique=False)
+    # Superseded by ix_audits_doc_created
+    op.drop_index('ix_audits_doc_id', table_name='audits')
+
+
+def downgrade() -> None:
+    op.create_index('ix_audits_doc_id', 'audits', ['doc_id'], unique=False)
+    op.drop_index('ix_audits_doc_created', table_name='audits')
+    op.drop_index('ix_audits_user_created', table_name='audits')
+    op.drop_index('ix_audits_action_created', table_name='audits')
@@ -0,0 +1,25 @@
+"""Trigram indexes for admin user search
+
+Revision ID: 006
+Revises: 005
+Create Date: 2024-03-10 00:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Back ILIKE '%term%' lookups on usernames and emails
+    op.execute('CREATE INDEX ix_users_username_trgm ON users USING GIN (username gin_trgm_ops)')
+    op.execute('CREATE INDEX ix_users_email_trgm ON users USING GIN (email gin_trgm_ops)')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_email_trgm', table_name='users')
+    op.drop_index('ix_users_username_trgm', table_name='users')
@@ -0,0 +1,25 @@
+"""Denormalize username onto audits
+
+Revision ID: 007
+Revises: 006
+Create Date: 2024-03-20 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Audit listings render the username without joining users
+    op.add_column('audits', sa.Column('username', sa.String(length=50), nullable=True))
+    op.execute('UPDATE audits SET username = u.username FROM users u WHERE u.id = audits.user_id')
+
+
+def downgrade() -> None:
+    op.drop_column('audits', 'username')
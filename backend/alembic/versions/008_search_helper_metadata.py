@@ -0,0 +1,29 @@
+"""Store Paperless document metadata on search_helpers
+
+Revision ID: 008
+Revises: 007
+Create Date: 2024-03-21 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Search results are rendered from these without calling Paperless;
+    # existing rows are filled in on their next sync
+    op.add_column('search_helpers', sa.Column('created_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('search_helpers', sa.Column('modified_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('search_helpers', sa.Column('content_excerpt', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('search_helpers', 'content_excerpt')
+    op.drop_column('search_helpers', 'modified_at')
+    op.drop_column('search_helpers', 'created_at')
@@ -0,0 +1,25 @@
+"""Index for the unfiltered audit log and retention cleanup
+
+Revision ID: 009
+Revises: 008
+Create Date: 2024-03-22 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Newest-first listing without filters, and the created_at < cutoff range
+    # scanned by audit cleanup; filtered listings use the composite indexes
+    op.create_index('ix_audits_created', 'audits', [sa.text('created_at DESC')], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_audits_created', table_name='audits')
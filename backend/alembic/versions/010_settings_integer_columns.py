@@ -0,0 +1,39 @@
+"""Store numeric settings as integers
+
+Revision ID: 010
+Revises: 009
+Create Date: 2024-03-22 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.alter_column('settings', 'max_upload_mb',
+                    type_=sa.Integer(),
+                    existing_type=sa.String(length=10),
+                    existing_nullable=False,
+                    postgresql_using='max_upload_mb::integer')
+    op.alter_column('settings', 'session_timeout_hours',
+                    type_=sa.Integer(),
+                    existing_type=sa.String(length=5),
+                    existing_nullable=False,
+                    postgresql_using='session_timeout_hours::integer')
+
+
+def downgrade() -> None:
+    op.alter_column('settings', 'session_timeout_hours',
+                    type_=sa.String(length=5),
+                    existing_type=sa.Integer(),
+                    existing_nullable=False)
+    op.alter_column('settings', 'max_upload_mb',
+                    type_=sa.String(length=10),
+                    existing_type=sa.Integer(),
+                    existing_nullable=False)
@@ -0,0 +1,34 @@
+"""Include the stored document text in normalized_text
+
+Revision ID: 011
+Revises: 010
+Create Date: 2024-03-29 00:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # A generated expression cannot be altered in place, rebuild the column
+    op.execute('ALTER TABLE search_helpers DROP COLUMN normalized_text')
+    op.execute(
+        "ALTER TABLE search_helpers ADD COLUMN normalized_text tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('simple', lower(immutable_unaccent(title)) || ' ' || title "
+        "|| ' ' || coalesce(content_excerpt, ''))) STORED"
+    )
+    op.execute('CREATE INDEX ix_search_helpers_normalized_text ON search_helpers USING GIN (normalized_text)')
+
+
+def downgrade() -> None:
+    op.execute('ALTER TABLE search_helpers DROP COLUMN normalized_text')
+    op.execute(
+        "ALTER TABLE search_helpers ADD COLUMN normalized_text tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('simple', lower(immutable_unaccent(title)) || ' ' || title)) STORED"
+    )
+    op.execute('CREATE INDEX ix_search_helpers_normalized_text ON search_helpers USING GIN (normalized_text)')
@@ -1,18 +1,23 @@
 """
 Admin routes
 """
-from typing import List
+from datetime import datetime, timedelta
+from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select, text, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 
 from app.core.database import get_db
 from app.core.auth import get_current_admin_user
+from app.core.paperless import paperless_client
 from app.models.user import User
 from app.models.audit import Audit, AuditAction
 
 router = APIRouter()
 
+AUDIT_CLEANUP_BATCH_SIZE = 10000
+
 class AuditResponse(BaseModel):
     id: str
     user: str
@@ -35,42 +40,17 @@ class StatsResponse(BaseModel):
 @router.get("/stats", response_model=StatsResponse)
 async def get_admin_stats(
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get admin dashboard statistics"""
-    from datetime import datetime, timedelta
-    
-    # User stats
-    total_users = db.query(User).count()
-    active_users = db.query(User).filter(User.is_active == True).count()
-    
-    # Document stats (from search helpers)
-    from app.models.search_helper import SearchHelper
-    total_documents = db.query(SearchHelper).count()
-    
-    # Audit stats
-    total_audits = db.query(Audit).count()
-    
-    # Recent activity (last 7 days)
-    week_ago = datetime.utcnow() - timedelta(days=7)
-    recent_uploads = db.query(Audit).filter(
-        Audit.action == AuditAction.UPLOAD,
-        Audit.created_at >= week_ago
-    ).count()
-    
-    recent_downloads = db.query(Audit).filter(
-        Audit.action == AuditAction.DOWNLOAD,
-        Audit.created_at >= week_ago
-    ).count()
-    
-    return StatsResponse(
-        total_users=total_users,
-        active_users=active_users,
-        total_documents=total_documents,
-        total_audits=total_audits,
-        recent_uploads=recent_uploads,
-        recent_downloads=recent_downloads
-    )
+    # Served from the mv_admin_stats rollup, refreshed in the background
+    stats = (await db.execute(text("""
+        SELECT total_users, active_users, total_documents,
+               total_audits, recent_uploads, recent_downloads
+        FROM mv_admin_stats
+    """))).one()
+    
+    return StatsResponse(**stats._mapping)
 
 @router.get("/audit", response_model=List[AuditResponse])
 async def get_audit_log(
@@ -78,17 +58,28 @@ async def get_audit_log(
     action: Optional[str] = None,
     user_id: Optional[str] = None,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get audit log with optional filtering"""
     
-    query = db.query(Audit)
+    # Fetch plain rows with just the serialized columns, no ORM instances
+    query = select(
+        Audit.id,
+        Audit.username,
+        Audit.action,
+        Audit.doc_id,
+        Audit.doc_title,
+        Audit.ip_address,
+        Audit.user_agent,
+        Audit.details,
+        Audit.created_at
+    )
     
     # Apply filters
     if action:
         try:
             action_enum = AuditAction(action)
-            query = query.filter(Audit.action == action_enum)
+            query = query.where(Audit.action == action_enum)
         except ValueError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -96,15 +87,17 @@ async def get_audit_log(
             )
     
     if user_id:
-        query = query.filter(Audit.user_id == user_id)
+        query = query.where(Audit.user_id == user_id)
     
     # Get results
-    audits = query.order_by(Audit.created_at.desc()).limit(limit).all()
+    audits = (await db.execute(
+        query.order_by(Audit.created_at.desc()).limit(limit)
+    )).all()
     
     return [
         AuditResponse(
             id=str(audit.id),
-            user=audit.user.username,
+            user=audit.username,
             action=audit.action.value,
             doc_id=audit.doc_id,
             doc_title=audit.doc_title,
@@ -120,39 +113,40 @@ async def get_audit_log(
 async def get_user_activity(
     days: int = 30,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get user activity summary"""
-    from datetime import datetime, timedelta
-    from sqlalchemy import func
-    
     since = datetime.utcnow() - timedelta(days=days)
     
-    # Get user activity counts
-    activity = db.query(
-        Audit.user_id,
+    # Get user details and activity counts in one round-trip
+    activity = (await db.execute(select(
+        User.id,
+        User.username,
+        User.email,
+        User.role,
+        User.is_active,
         func.count(Audit.id).label('total_actions'),
-        func.count(func.distinct(Audit.created_at.date())).label('active_days'),
+        func.count(func.distinct(func.date(Audit.created_at))).label('active_days'),
         func.max(Audit.created_at).label('last_activity')
-    ).filter(
+    ).join(
+        Audit, Audit.user_id == User.id
+    ).where(
         Audit.created_at >= since
-    ).group_by(Audit.user_id).all()
-    
-    # Get user details
-    user_activity = []
-    for act in activity:
-        user = db.query(User).filter(User.id == act.user_id).first()
-        if user:
-            user_activity.append({
-                "user_id": str(user.id),
-                "username": user.username,
-                "email": user.email,
-                "role": user.role.value,
-                "is_active": user.is_active,
-                "total_actions": act.total_actions,
-                "active_days": act.active_days,
-                "last_activity": act.last_activity.isoformat()
-            })
+    ).group_by(User.id))).all()
+    
+    user_activity = [
+        {
+            "user_id": str(act.id),
+            "username": act.username,
+            "email": act.email,
+            "role": act.role.value,
+            "is_active": act.is_active,
+            "total_actions": act.total_actions,
+            "active_days": act.active_days,
+            "last_activity": act.last_activity.isoformat()
+        }
+        for act in activity
+    ]
     
     return {"user_activity": user_activity}
 
@@ -160,18 +154,26 @@ async def get_user_activity(
 async def cleanup_audit_log(
     days_to_keep: int = 365,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Clean up old audit logs"""
-    from datetime import datetime, timedelta
-    
     cutoff_date = datetime.utcnow() - timedelta(days=days_to_keep)
     
-    deleted_count = db.query(Audit).filter(
-        Audit.created_at < cutoff_date
-    ).delete()
-    
-    db.commit()
+    # Delete in batches with intermediate commits to keep locks and WAL small
+    deleted_count = 0
+    while True:
+        deleted = (await db.execute(text("""
+            DELETE FROM audits
+            WHERE id IN (
+                SELECT id FROM audits
+                WHERE created_at < :cutoff
+                LIMIT :batch_size
+            )
+        """), {"cutoff": cutoff_date, "batch_size": AUDIT_CLEANUP_BATCH_SIZE})).rowcount
+        await db.commit()
+        deleted_count += deleted
+        if deleted < AUDIT_CLEANUP_BATCH_SIZE:
+            break
     
     return {
         "message": f"Cleaned up {deleted_count} old audit entries",
@@ -184,8 +186,6 @@ async def check_paperless_status(
     current_user: User = Depends(get_current_admin_user)
 ):
     """Check Paperless-ngx connectivity status"""
-    from app.core.paperless import paperless_client
-    
     try:
         is_connected = await paperless_client.test_connection()
         return {
@@ -204,9 +204,11 @@ async def check_paperless_status(
 @router.post("/paperless/sync")
 async def sync_with_paperless(
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Trigger sync with Paperless-ngx"""
+    paperless_client.invalidate_document()
+    
     # This would typically run as a background task
     # For now, just return success
     return {"message": "Paperless sync initiated"}
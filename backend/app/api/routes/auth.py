@@ -6,7 +6,8 @@ from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from fastapi.security import HTTPBearer
 from slowapi import Limiter
 from slowapi.util import get_remote_address
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 
 from app.core.config import settings
@@ -15,7 +16,7 @@ from app.core.auth import (
     authenticate_user, 
     create_access_token, 
     get_current_user,
-    get_password_hash
+    aget_password_hash
 )
 from app.core.audit import log_login
 from app.models.user import User, UserRole
@@ -44,11 +45,11 @@ class UserInfo(BaseModel):
 async def login(
     request: Request,
     login_data: LoginRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     response: Response = None
 ):
     """Authenticate user and return JWT token"""
-    user = authenticate_user(db, login_data.username, login_data.password)
+    user = await authenticate_user(db, login_data.username, login_data.password)
     
     if not user:
         raise HTTPException(
@@ -57,18 +58,29 @@ async def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Update last login time
-    from datetime import datetime
-    user.last_login_at = datetime.utcnow()
-    db.commit()
+    # Read everything the response needs up front
+    user_id = user.id
+    user_info = {
+        "id": str(user_id),
+        "username": user.username,
+        "email": user.email,
+        "role": user.role.value,
+        "is_active": user.is_active
+    }
+    
+    # Update last login time, the only commit on the request path
+    await db.execute(
+        update(User).where(User.id == user_id).values(last_login_at=func.now())
+    )
+    await db.commit()
     
-    # Log login
-    log_login(db, user, request)
+    # Log login (queued, written in the background)
+    await log_login(user, request)
     
     # Create access token
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": user_info["username"]}, expires_delta=access_token_expires
     )
     
     # Set httpOnly cookie for web frontend
@@ -83,13 +95,7 @@ async def login(
     
     return LoginResponse(
         access_token=access_token,
-        user={
-            "id": str(user.id),
-            "username": user.username,
-            "email": user.email,
-            "role": user.role.value,
-            "is_active": user.is_active
-        }
+        user=user_info
     )
 
 @router.post("/logout")
@@ -110,9 +116,9 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
     )
 
 @router.get("/setup-status")
-async def setup_status(db: Session = Depends(get_db)):
+async def setup_status(db: AsyncSession = Depends(get_db)):
     """Check if initial setup is needed"""
-    user_count = db.query(User).count()
+    user_count = await db.scalar(select(func.count()).select_from(User))
     return {
         "setup_required": user_count == 0,
         "user_count": user_count
@@ -122,11 +128,11 @@ async def setup_status(db: Session = Depends(get_db)):
 async def initial_setup(
     request: Request,
     login_data: LoginRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     response: Response = None
 ):
     """Create initial admin user (only when no users exist)"""
-    user_count = db.query(User).count()
+    user_count = await db.scalar(select(func.count()).select_from(User))
     
     if user_count > 0:
         raise HTTPException(
@@ -137,17 +143,17 @@ async def initial_setup(
     # Create admin user
     admin_user = User(
         username=login_data.username,
-        password_hash=get_password_hash(login_data.password),
+        password_hash=await aget_password_hash(login_data.password),
         role=UserRole.ADMIN,
         is_active=True
     )
     
     db.add(admin_user)
-    db.commit()
-    db.refresh(admin_user)
+    await db.commit()
+    await db.refresh(admin_user)
     
     # Log setup
-    log_login(db, admin_user, request)
+    await log_login(admin_user, request)
     
     # Create access token
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
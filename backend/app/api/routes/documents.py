@@ -1,19 +1,25 @@
 """
 Document management routes
 """
-from typing import Optional
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Request, UploadFile, File
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from starlette.background import BackgroundTask
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert
 from pydantic import BaseModel
-import io
+import asyncio
 import logging
 
-from app.core.database import get_db
+from app.core.database import get_db, AsyncSessionLocal
 from app.core.auth import get_current_user
-from app.core.paperless import paperless_client
+from app.core.paperless import paperless_client, PaperlessStream
 from app.core.audit import log_upload, log_download
+from app.core.cache import invalidate_search_cache
 from app.models.user import User
+from app.models.audit import Audit
 from app.models.search_helper import SearchHelper
 from app.core.enumber_parser import enumber_parser
 from app.core.config import settings
@@ -39,13 +45,44 @@ class DocumentListResponse(BaseModel):
     tags: list
     correspondent: Optional[str]
 
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MB
+# Document text stored on search helpers for full-text matches and snippets;
+# about 50 pages, text past it is neither matched nor highlighted
+CONTENT_EXCERPT_CHARS = 100_000
+RESYNC_BATCH_SIZE = 100
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parse a Paperless ISO 8601 timestamp, None if missing or malformed"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+async def iter_upload(file: UploadFile) -> AsyncIterator[bytes]:
+    """Read an upload in chunks, enforcing the size limit as we go"""
+    max_bytes = settings.MAX_UPLOAD_MB << 20
+    total = 0
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"File too large. Maximum size: {settings.MAX_UPLOAD_MB}MB"
+            )
+        yield chunk
+
 @router.post("/upload")
 async def upload_document(
     request: Request,
     file: UploadFile = File(...),
     title: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Upload document to Paperless"""
     
@@ -56,32 +93,31 @@ async def upload_document(
             detail="Only PDF files are allowed"
         )
     
-    # Check file size
-    file_content = await file.read()
-    file_size_mb = len(file_content) / (1024 * 1024)
-    
-    if file_size_mb > settings.MAX_UPLOAD_MB:
+    # Reject oversized files up front when the size is already known
+    if file.size is not None and file.size > settings.MAX_UPLOAD_MB << 20:
         raise HTTPException(
             status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
             detail=f"File too large. Maximum size: {settings.MAX_UPLOAD_MB}MB"
         )
     
     try:
-        # Upload to Paperless
+        # Stream to Paperless, size limit is enforced while reading
         result = await paperless_client.upload_document(
-            file_content=file_content,
+            file_stream=iter_upload(file),
             filename=file.filename or "document.pdf",
-            title=title or file.filename or "Uploaded Document"
+            title=title or file.filename or "Uploaded Document",
+            size=file.size
         )
         
         doc_id = str(result.get("id"))
         doc_title = result.get("title", "Unknown Document")
         
         # Log upload
-        log_upload(db, current_user, request, doc_id, doc_title)
+        await log_upload(current_user, request, doc_id, doc_title)
         
         # Trigger search helper update (async)
-        await update_search_helpers(db, doc_id)
+        if await update_search_helpers(db, doc_id):
+            await invalidate_search_cache()
         
         return {
             "message": "Document uploaded successfully",
@@ -93,6 +129,8 @@ async def upload_document(
             }
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Upload failed: {e}")
         raise HTTPException(
@@ -104,11 +142,11 @@ async def upload_document(
 async def get_document(
     doc_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get document metadata"""
     try:
-        doc = await paperless_client.get_document(doc_id)
+        doc = await paperless_client.get_document_with_content(doc_id)
         
         return DocumentResponse(
             id=str(doc.get("id")),
@@ -133,28 +171,39 @@ async def download_document(
     doc_id: str,
     request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Download document with audit logging"""
+    # Open the upstream stream while fetching metadata for logging, so errors
+    # surface before the response starts
+    stream_task = asyncio.ensure_future(paperless_client.stream_document(doc_id))
     try:
-        # Get document metadata first for logging
-        doc = await paperless_client.get_document(doc_id)
-        doc_title = doc.get("title", "Unknown Document")
-        
-        # Download document content
-        content = await paperless_client.download_document(doc_id)
-        
-        # Log download
-        log_download(db, current_user, request, doc_id, doc_title)
+        try:
+            doc = await paperless_client.get_document(doc_id)
+            content_stream = await stream_task
+        except BaseException:
+            await _discard_stream(stream_task)
+            raise
         
-        # Return streaming response
-        return StreamingResponse(
-            io.BytesIO(content),
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f"attachment; filename={doc_title}.pdf"
-            }
-        )
+        try:
+            doc_title = doc.get("title", "Unknown Document")
+            
+            # Log download
+            await log_download(current_user, request, doc_id, doc_title)
+            
+            # Pass the PDF through chunk by chunk; the background task closes
+            # the upstream response even if the client leaves before reading
+            return StreamingResponse(
+                content_stream,
+                media_type="application/pdf",
+                headers={
+                    "Content-Disposition": f"attachment; filename={doc_title}.pdf"
+                },
+                background=BackgroundTask(content_stream.aclose)
+            )
+        except BaseException:
+            await content_stream.aclose()
+            raise
         
     except Exception as e:
         logger.error(f"Download failed for document {doc_id}: {e}")
@@ -163,6 +212,14 @@ async def download_document(
             detail="Document not found or download failed"
         )
 
+async def _discard_stream(stream_task: "asyncio.Future[PaperlessStream]") -> None:
+    """Cancel a pending stream_document call, or close the stream it opened"""
+    if not stream_task.done():
+        stream_task.cancel()
+        await asyncio.wait([stream_task])
+    if not stream_task.cancelled() and stream_task.exception() is None:
+        await stream_task.result().aclose()
+
 @router.get("/{doc_id}/thumb")
 async def get_document_thumbnail(
     doc_id: str,
@@ -170,17 +227,18 @@ async def get_document_thumbnail(
 ):
     """Get document thumbnail"""
     try:
-        thumb_content = await paperless_client.get_document_thumb(doc_id)
+        thumb_stream = await paperless_client.stream_document_thumb(doc_id)
         
-        if not thumb_content:
+        if thumb_stream is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Thumbnail not available"
             )
         
         return StreamingResponse(
-            io.BytesIO(thumb_content),
-            media_type="image/jpeg"
+            thumb_stream,
+            media_type="image/jpeg",
+            background=BackgroundTask(thumb_stream.aclose)
         )
         
     except HTTPException:
@@ -197,19 +255,24 @@ async def get_document_audit(
     doc_id: str,
     limit: int = 20,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get audit trail for a document"""
-    from app.models.audit import Audit, AuditAction
-    
-    audits = db.query(Audit).filter(
+    audits = (await db.execute(select(
+        Audit.id,
+        Audit.username,
+        Audit.action,
+        Audit.created_at,
+        Audit.ip_address,
+        Audit.user_agent
+    ).where(
         Audit.doc_id == doc_id
-    ).order_by(Audit.created_at.desc()).limit(limit).all()
+    ).order_by(Audit.created_at.desc()).limit(limit))).all()
     
     return [
         {
             "id": str(audit.id),
-            "user": audit.user.username,
+            "user": audit.username,
             "action": audit.action.value,
             "created_at": audit.created_at.isoformat(),
             "ip_address": audit.ip_address,
@@ -218,64 +281,81 @@ async def get_document_audit(
         for audit in audits
     ]
 
-async def update_search_helpers(db: Session, doc_id: str):
-    """Update search helpers for a document"""
-    try:
-        # Get document content from Paperless
-        content = await paperless_client.get_document_content(doc_id)
-        doc = await paperless_client.get_document(doc_id)
-        
-        if not content and not doc:
-            return
-        
-        title = doc.get("title", "") if doc else ""
-        full_text = f"{title} {content}" if content else title
-        
-        # Extract E-numbers
-        enumbers = enumber_parser.extract_enumbers(full_text)
-        
-        # Normalize title for trigram search
-        normalized_title = normalize_text_for_search(title)
-        
-        # Create or update search helper
-        search_helper = db.query(SearchHelper).filter(
-            SearchHelper.doc_id == doc_id
-        ).first()
-        
-        if not search_helper:
-            search_helper = SearchHelper(doc_id=doc_id)
-            db.add(search_helper)
-        
-        search_helper.title = title
-        search_helper.enumbers = enumbers
-        search_helper.normalized_title = normalized_title
-        search_helper.normalized_text = full_text  # In production, use proper TSVECTOR
-        
-        db.commit()
-        
-    except Exception as e:
-        logger.error(f"Failed to update search helpers for {doc_id}: {e}")
-        db.rollback()
-
-def normalize_text_for_search(text: str) -> str:
-    """Normalize text for trigram search"""
-    if not text:
-        return ""
+async def index_search_helpers(
+    db: AsyncSession,
+    doc_id: str,
+    doc: Optional[Dict[str, Any]] = None
+) -> None:
+    """Upsert search helpers for a document, optionally from already fetched JSON.
     
-    import re
-    import unicodedata
+    Raises DocumentNotFoundError, other Paperless errors, or SQLAlchemyError.
+    """
+    # Metadata and text content come from the same Paperless document JSON
+    if doc is None:
+        doc = await paperless_client.get_document_with_content(doc_id)
     
-    # Convert to lowercase
-    text = text.lower()
+    content = doc.get("content")
     
-    # Remove accents
-    text = unicodedata.normalize('NFD', text)
-    text = ''.join(c for c in text if unicodedata.category(c) != 'Mn')
+    title = doc.get("title", "")
+    full_text = f"{title} {content}" if content else title
     
-    # Remove special characters, keep alphanumeric and spaces
-    text = re.sub(r'[^\w\s]', ' ', text)
+    # Extract E-numbers
+    enumbers = enumber_parser.extract_enumbers(full_text)
     
-    # Normalize whitespace
-    text = re.sub(r'\s+', ' ', text).strip()
+    # Metadata kept alongside so search results need no Paperless call
+    metadata = {
+        "created_at": _parse_timestamp(doc.get("created")),
+        "modified_at": _parse_timestamp(doc.get("modified")),
+        "content_excerpt": content[:CONTENT_EXCERPT_CHARS] if content else None
+    }
+    
+    # Create or update search helper in one statement
+    stmt = insert(SearchHelper).values(
+        doc_id=doc_id,
+        title=title,
+        enumbers=enumbers,
+        **metadata
+    ).on_conflict_do_update(
+        index_elements=[SearchHelper.doc_id],
+        set_={
+            "title": title,
+            "enumbers": enumbers,
+            **metadata,
+            "last_seen_at": func.now()
+        }
+    )
+    try:
+        await db.execute(stmt)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+async def update_search_helpers(
+    db: AsyncSession,
+    doc_id: str,
+    doc: Optional[Dict[str, Any]] = None
+) -> bool:
+    """Update search helpers for a document, logging failures; True if stored"""
+    try:
+        await index_search_helpers(db, doc_id, doc)
+        return True
+    except Exception as e:
+        logger.error(f"Failed to update search helpers for {doc_id}: {e}")
+        return False
+
+async def resync_search_helpers() -> None:
+    """Refresh all known search helpers from Paperless (for BackgroundTasks)"""
+    async with AsyncSessionLocal() as db:
+        doc_ids = (await db.scalars(select(SearchHelper.doc_id))).all()
+        for start in range(0, len(doc_ids), RESYNC_BATCH_SIZE):
+            batch = doc_ids[start:start + RESYNC_BATCH_SIZE]
+            # Fetch the batch concurrently; only this batch's texts are held
+            docs = await paperless_client.get_documents(batch, with_content=True)
+            for doc_id, doc in zip(batch, docs):
+                if isinstance(doc, Exception):
+                    logger.error(f"Failed to get document {doc_id} for search helpers: {doc}")
+                    continue
+                await update_search_helpers(db, doc_id, doc)
     
-    return text
+    await invalidate_search_cache()
@@ -2,15 +2,25 @@
 n8n API hooks for external integration
 """
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
+import logging
 
 from app.core.database import get_db
-from app.core.auth import get_current_user
+from app.core.auth import get_current_user, get_current_admin_user
+from app.core.audit import log_search
+from app.core.paperless import paperless_client, DocumentNotFoundError
+from app.core.cache import invalidate_search_cache
+from app.api.routes.documents import index_search_helpers
+from app.api.routes.search import search_service
 from app.models.user import User
+from app.models.audit import Audit
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 class HookSearchRequest(BaseModel):
     query: Optional[str] = None
@@ -33,8 +43,9 @@ class HookSearchResponse(BaseModel):
 @router.post("/search", response_model=HookSearchResponse)
 async def hook_search(
     request: HookSearchRequest,
+    http_request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """n8n API hook for programmatic document search"""
     
@@ -60,24 +71,8 @@ async def hook_search(
         )
     
     # Use the same search logic as the main search endpoint
-    from app.api.routes.search import search_documents
-    from fastapi import Request
-    
-    # Create a mock request for the search function
-    class MockRequest:
-        def __init__(self):
-            self.headers = {}
-    
-    mock_request = MockRequest()
-    
-    # Get search results
-    search_response = await search_documents(
-        request=mock_request,
-        q=search_query,
-        limit=request.limit,
-        current_user=current_user,
-        db=db
-    )
+    await log_search(current_user, http_request, search_query)
+    search_response = await search_service(search_query, request.limit, db)
     
     # Transform results to hook format
     results = []
@@ -101,26 +96,28 @@ async def get_document_meta(
     doc_id: str,
     limit: int = Query(10, description="Number of recent audits to return"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get document metadata and recent audits for n8n"""
     
     try:
-        from app.core.paperless import paperless_client
-        
         # Get document metadata
         doc = await paperless_client.get_document(doc_id)
         
         # Get recent audits
-        from app.models.audit import Audit
-        audits = db.query(Audit).filter(
+        audits = (await db.execute(select(
+            Audit.username,
+            Audit.action,
+            Audit.created_at,
+            Audit.ip_address
+        ).where(
             Audit.doc_id == doc_id
-        ).order_by(Audit.created_at.desc()).limit(limit).all()
+        ).order_by(Audit.created_at.desc()).limit(limit))).all()
         
         audit_data = []
         for audit in audits:
             audit_data.append({
-                "user": audit.user.username,
+                "user": audit.username,
                 "action": audit.action.value,
                 "created_at": audit.created_at.isoformat(),
                 "ip_address": audit.ip_address
@@ -145,6 +142,39 @@ async def get_document_meta(
             detail="Document not found"
         )
 
+@router.post("/doc/{doc_id}/index")
+async def index_document(
+    doc_id: str,
+    current_user: User = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Index a document added in Paperless directly (e.g. from a post-consume workflow)"""
+    
+    # E-numbers are extracted here once; searches only probe the stored array
+    paperless_client.invalidate_document(doc_id)
+    try:
+        await index_search_helpers(db, doc_id)
+    except DocumentNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+    except SQLAlchemyError as e:
+        logger.error(f"Failed to store search helpers for {doc_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Search index unavailable"
+        )
+    except Exception as e:
+        logger.error(f"Failed to index document {doc_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Failed to get document from Paperless"
+        )
+    await invalidate_search_cache()
+    
+    return {"message": "Document indexed", "doc_id": doc_id}
+
 @router.get("/health")
 async def hook_health_check():
     """Health check endpoint for n8n monitoring"""
@@ -1,10 +1,17 @@
 """
 Search routes with tolerant E-number and text search
 """
+import logging
+import re
+import unicodedata
+from functools import lru_cache
+from datetime import datetime
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import text, func
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Query, BackgroundTasks
+from sqlalchemy import text, bindparam, String
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from slowapi import Limiter
 from slowapi.util import get_remote_address
@@ -12,13 +19,23 @@ from slowapi.util import get_remote_address
 from app.core.database import get_db
 from app.core.auth import get_current_user
 from app.core.audit import log_search
+from app.core.cache import cache_key, get_cached, set_cached
 from app.core.config import settings
 from app.core.enumber_parser import enumber_parser
+from app.core.paperless import paperless_client
+from app.api.routes.documents import resync_search_helpers
 from app.models.user import User
-from app.models.search_helper import SearchHelper
 
 router = APIRouter()
 limiter = Limiter(key_func=get_remote_address)
+logger = logging.getLogger(__name__)
+
+# Fixed per process, bound once instead of read from settings per request
+_SEARCH_RATE = f"{settings.RATE_LIMIT_SEARCH_PER_MIN}/minute"
+_TRGM_THRESHOLD = str(settings.ENUMBER_SEARCH_TOLERANCE)
+
+# ts_headline settings for result snippets; plain text, the UI renders no markup
+SNIPPET_OPTIONS = 'MaxWords=30, MinWords=15, StartSel="", StopSel=""'
 
 class SearchResult(BaseModel):
     doc_id: str
@@ -35,39 +52,67 @@ class SearchResponse(BaseModel):
     query: str
     enumbers_found: List[str]
 
+_PUNCT_RE = re.compile(r'[^\w\s]')
+_WS_RE = re.compile(r'\s+')
+
+# Accent stripping for common Latin-1 letters without a per-character NFD pass
+_ACCENT_TABLE = str.maketrans({
+    c: unicodedata.normalize('NFD', c)[0]
+    for c in "áàâäãåéèêëíìîïóòôöõúùûüçñÁÀÂÄÃÅÉÈÊËÍÌÎÏÓÒÔÖÕÚÙÛÜÇÑ"
+})
+
+@lru_cache(maxsize=4096)
 def normalize_text_for_search(text: str) -> str:
     """Normalize text for trigram search"""
     if not text:
         return ""
     
-    import re
-    import unicodedata
-    
     # Convert to lowercase
     text = text.lower()
     
-    # Remove accents
-    text = unicodedata.normalize('NFD', text)
-    text = ''.join(c for c in text if unicodedata.category(c) != 'Mn')
+    # Remove accents, falling back to NFD for anything outside the table
+    if not text.isascii():
+        text = text.translate(_ACCENT_TABLE)
+        if not text.isascii():
+            text = unicodedata.normalize('NFD', text)
+            text = ''.join(c for c in text if unicodedata.category(c) != 'Mn')
     
     # Remove special characters, keep alphanumeric and spaces
-    text = re.sub(r'[^\w\s]', ' ', text)
+    text = _PUNCT_RE.sub(' ', text)
     
     # Normalize whitespace
-    text = re.sub(r'\s+', ' ', text).strip()
+    text = _WS_RE.sub(' ', text).strip()
     
     return text
 
 @router.get("/", response_model=SearchResponse)
-@limiter.limit(f"{settings.RATE_LIMIT_SEARCH_PER_MIN}/minute")
+@limiter.limit(_SEARCH_RATE)
 async def search_documents(
     request: Request,
-    q: str = Query(..., description="Search query"),
+    q: str = Query(..., max_length=512, description="Search query"),
     limit: int = Query(50, le=100, description="Maximum results"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Search documents with tolerant E-number and text matching"""
+    if q.strip():
+        await log_search(current_user, request, q)
+    
+    return await search_service(q, limit, db)
+
+async def search_service(q: str, limit: int, db: AsyncSession) -> SearchResponse:
+    """Run a document search, shared by the search route and the n8n hook"""
+    key = cache_key("search", limit, q)
+    cached = await get_cached(key)
+    if cached is not None:
+        return SearchResponse.model_validate(cached)
+    
+    response = await _run_search(q, limit, db)
+    await set_cached(key, response.model_dump(), settings.SEARCH_CACHE_TTL_SECONDS)
+    return response
+
+async def _run_search(q: str, limit: int, db: AsyncSession) -> SearchResponse:
+    """Query search_helpers for documents matching q"""
     
     if not q.strip():
         return SearchResponse(
@@ -77,9 +122,6 @@ async def search_documents(
             enumbers_found=[]
         )
     
-    # Log search
-    log_search(db, current_user, request, q)
-    
     # Extract E-numbers from query
     query_enumbers = enumber_parser.extract_enumbers(q)
     
@@ -89,45 +131,62 @@ async def search_documents(
     results = []
     enumbers_found = []
     
-    try:
-        # Build search query
-        query_parts = []
-        params = {"limit": limit}
-        
-        # E-number search
-        if query_enumbers:
-            for i, enumber in enumerate(query_enumbers):
-                query_parts.append(f"enumbers @> ARRAY[%(enumber_{i})s]")
-                params[f"enumber_{i}"] = enumber
-            enumbers_found = query_enumbers
-        
-        # Text search with trigram similarity
-        if normalized_query:
-            # Split query into words for better matching
-            words = normalized_query.split()
-            if words:
-                # Use trigram similarity for each word
-                trigram_conditions = []
-                for i, word in enumerate(words):
-                    if len(word) > 2:  # Skip very short words
-                        trigram_conditions.append(
-                            f"similarity(normalized_title, %(word_{i})s) > {settings.ENUMBER_SEARCH_TOLERANCE}"
-                        )
-                        params[f"word_{i}"] = word
-                
-                if trigram_conditions:
-                    query_parts.append(f"({' OR '.join(trigram_conditions)})")
-        
-        # Build final query
-        if query_parts:
-            where_clause = " OR ".join(query_parts)
-            search_query = text(f"""
+    # Build search query
+    query_parts = []
+    params = {"limit": limit, "enumbers_arr": query_enumbers}
+    
+    # E-number search, a single set overlap served by the GIN index
+    if query_enumbers:
+        query_parts.append("enumbers && :enumbers_arr")
+        enumbers_found = query_enumbers
+    
+    # Text search with trigram similarity
+    if normalized_query:
+        # Split query into words for better matching
+        words = normalized_query.split()
+        if words:
+            # Use the trigram % operator for each word so the GIN index
+            # applies; the cutoff comes from pg_trgm.similarity_threshold
+            trigram_conditions = []
+            for i, word in enumerate(words):
+                if len(word) > 2:  # Skip very short words
+                    trigram_conditions.append(f"normalized_title % :word_{i}")
+                    params[f"word_{i}"] = word
+            
+            if trigram_conditions:
+                query_parts.append(f"({' OR '.join(trigram_conditions)})")
+
+        # Full-text match, expression must stay identical to the GIN index
+        query_parts.append("normalized_text @@ plainto_tsquery('simple', :query_text)")
+    
+    # Build final query
+    if query_parts:
+        where_clause = " OR ".join(query_parts)
+        # Snippets are built by ts_headline in the outer query, so only
+        # the rows that survive LIMIT are highlighted; content_excerpt holds
+        # the first CONTENT_EXCERPT_CHARS of a document, later text gets none
+        search_query = text(f"""
+            SELECT
+                doc_id,
+                title,
+                enumbers,
+                created_at,
+                modified_at,
+                score,
+                ts_headline('simple', content_excerpt,
+                            plainto_tsquery('simple', :query_text),
+                            :snippet_options) as snippet
+            FROM (
                 SELECT 
                     doc_id,
                     title,
                     enumbers,
+                    created_at,
+                    modified_at,
+                    content_excerpt,
+                    last_seen_at,
                     GREATEST(
-                        CASE WHEN enumbers && ARRAY[{','.join([f'%(enumber_{i})s' for i in range(len(query_enumbers))])}] 
+                        CASE WHEN enumbers && :enumbers_arr
                              THEN 1.0 ELSE 0.0 END,
                         CASE WHEN normalized_title IS NOT NULL 
                              THEN similarity(normalized_title, :query_text) 
@@ -137,136 +196,107 @@ async def search_documents(
                 WHERE {where_clause}
                 ORDER BY score DESC, last_seen_at DESC
                 LIMIT :limit
-            """)
-            
-            params["query_text"] = normalized_query
-            
-            # Execute search
-            result = db.execute(search_query, params)
-            rows = result.fetchall()
-            
-            # Get document metadata from Paperless for results
-            from app.core.paperless import paperless_client
-            
-            for row in rows:
-                try:
-                    doc = await paperless_client.get_document(row.doc_id)
-                    results.append(SearchResult(
-                        doc_id=row.doc_id,
-                        title=row.title,
-                        created=doc.get("created", ""),
-                        modified=doc.get("modified", ""),
-                        snippet=generate_snippet(doc.get("content", ""), q),
-                        enumbers=row.enumbers or [],
-                        score=row.score
-                    ))
-                except Exception as e:
-                    # Skip documents that can't be retrieved
-                    continue
-        
-        return SearchResponse(
-            results=results,
-            total=len(results),
-            query=q,
-            enumbers_found=enumbers_found
-        )
+            ) AS hits
+            ORDER BY score DESC, last_seen_at DESC
+        """).bindparams(bindparam("enumbers_arr", type_=ARRAY(String)))
         
-    except Exception as e:
-        # Fallback to simple text search
-        search_helper = db.query(SearchHelper).filter(
-            func.lower(SearchHelper.title).contains(q.lower())
-        ).limit(limit).all()
+        params["query_text"] = normalized_query
+        params["snippet_options"] = SNIPPET_OPTIONS
         
-        results = []
-        for helper in search_helper:
-            try:
-                from app.core.paperless import paperless_client
-                doc = await paperless_client.get_document(helper.doc_id)
-                results.append(SearchResult(
-                    doc_id=helper.doc_id,
-                    title=helper.title,
-                    created=doc.get("created", ""),
-                    modified=doc.get("modified", ""),
-                    snippet=generate_snippet(doc.get("content", ""), q),
-                    enumbers=helper.enumbers or [],
-                    score=None
-                ))
-            except Exception:
-                continue
+        # Execute search, with the similarity cutoff scoped to this transaction
+        try:
+            await db.execute(
+                text("SELECT set_config('pg_trgm.similarity_threshold', :threshold, true)"),
+                {"threshold": _TRGM_THRESHOLD}
+            )
+            result = await db.execute(search_query, params)
+        except SQLAlchemyError as e:
+            logger.error(f"Search query failed for {q!r}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Search temporarily unavailable"
+            )
+        rows = result.fetchall()
         
-        return SearchResponse(
-            results=results,
-            total=len(results),
-            query=q,
-            enumbers_found=enumbers_found
-        )
-
-def generate_snippet(content: str, query: str, max_length: int = 200) -> Optional[str]:
-    """Generate a text snippet highlighting the query"""
-    if not content or not query:
-        return None
+        # Document metadata is stored on the helper rows, no Paperless calls
+        for row in rows:
+            results.append(SearchResult(
+                doc_id=row.doc_id,
+                title=row.title,
+                created=_isoformat(row.created_at),
+                modified=_isoformat(row.modified_at),
+                snippet=row.snippet,
+                enumbers=row.enumbers or [],
+                score=row.score
+            ))
     
-    # Find query in content (case insensitive)
-    query_lower = query.lower()
-    content_lower = content.lower()
-    
-    index = content_lower.find(query_lower)
-    if index == -1:
-        # Return beginning of content if query not found
-        return content[:max_length] + "..." if len(content) > max_length else content
-    
-    # Extract snippet around the match
-    start = max(0, index - max_length // 2)
-    end = min(len(content), index + len(query) + max_length // 2)
-    
-    snippet = content[start:end]
-    if start > 0:
-        snippet = "..." + snippet
-    if end < len(content):
-        snippet = snippet + "..."
-    
-    return snippet
+    return SearchResponse(
+        results=results,
+        total=len(results),
+        query=q,
+        enumbers_found=enumbers_found
+    )
+
+def _isoformat(value: Optional[datetime]) -> str:
+    """Render an optional timestamp for SearchResult"""
+    return value.isoformat() if value else ""
 
 @router.get("/suggest")
 async def search_suggestions(
-    q: str = Query(..., description="Partial search query"),
+    q: str = Query(..., max_length=512, description="Partial search query"),
     limit: int = Query(10, le=20),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get search suggestions based on partial query"""
     
     if len(q.strip()) < 2:
         return {"suggestions": []}
     
-    # Get suggestions from titles and E-numbers
-    suggestions = set()
+    key = cache_key("suggest", limit, q)
+    cached = await get_cached(key)
+    if cached is not None:
+        return cached
     
-    # Title suggestions
-    titles = db.query(SearchHelper.title).filter(
-        func.lower(SearchHelper.title).contains(q.lower())
-    ).limit(limit).all()
+    # Title and E-number suggestions in one round trip, titles first; the title
+    # match runs on normalized_title so the trigram index serves the LIKE '%...%'
+    pattern = "%" + q.replace("!", "!!").replace("%", "!%").replace("_", "!_") + "%"
+    result = await db.execute(
+        text("""
+            SELECT suggestion FROM (
+                (SELECT title AS suggestion, 0 AS source
+                 FROM search_helpers
+                 WHERE normalized_title LIKE lower(immutable_unaccent(:pattern)) ESCAPE '!'
+                 LIMIT :limit)
+                UNION ALL
+                (SELECT unnest(enumbers), 1
+                 FROM (SELECT enumbers FROM search_helpers
+                       WHERE enumbers && :enumbers_arr
+                       LIMIT :limit) AS matched
+                 LIMIT :limit)
+            ) AS candidates
+            ORDER BY source
+        """).bindparams(bindparam("enumbers_arr", type_=ARRAY(String))),
+        {"pattern": pattern, "enumbers_arr": [q.lower()], "limit": limit}
+    )
     
-    for title_row in titles:
-        suggestions.add(title_row.title)
+    # Insertion-ordered dedupe, stops once limit suggestions are collected
+    suggestions = {}
+    for row in result:
+        suggestions[row.suggestion] = None
+        if len(suggestions) >= limit:
+            break
     
-    # E-number suggestions
-    enumbers = db.query(SearchHelper.enumbers).filter(
-        SearchHelper.enumbers.op('&&')([q.lower()])
-    ).limit(limit).all()
-    
-    for enumber_row in enumbers:
-        if enumber_row.enumbers:
-            suggestions.update(enumber_row.enumbers)
-    
-    return {
-        "suggestions": list(suggestions)[:limit]
+    response = {
+        "suggestions": list(suggestions)
     }
+    await set_cached(key, response, settings.SUGGEST_CACHE_TTL_SECONDS)
+    return response
 
 @router.post("/sync")
 async def sync_search_helpers(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user)
 ):
     """Manually sync search helpers with Paperless (admin only)"""
     if current_user.role != "admin":
@@ -275,6 +305,9 @@ async def sync_search_helpers(
             detail="Admin access required"
         )
     
-    # This would typically be run as a background task
-    # For now, just return success
+    paperless_client.invalidate_document()
+    
+    # Re-fetch metadata for every indexed document after the response
+    background_tasks.add_task(resync_search_helpers)
+    
     return {"message": "Search sync initiated"}
@@ -2,14 +2,15 @@
 User management routes
 """
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy import select, or_
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, EmailStr
 import secrets
 import string
 
 from app.core.database import get_db
-from app.core.auth import get_current_user, get_current_admin_user, get_password_hash
+from app.core.auth import get_current_user, get_current_admin_user, aget_password_hash
 from app.models.user import User, UserRole
 
 router = APIRouter()
@@ -37,6 +38,16 @@ class PasswordReset(BaseModel):
     new_password: Optional[str] = None
     force_change: bool = False
 
+USER_RESPONSE_COLUMNS = (
+    User.id,
+    User.username,
+    User.email,
+    User.role,
+    User.is_active,
+    User.created_at,
+    User.last_login_at
+)
+
 def generate_temp_password(length: int = 12) -> str:
     """Generate a temporary password"""
     chars = string.ascii_letters + string.digits + "!@#$%^&*"
@@ -44,11 +55,23 @@ def generate_temp_password(length: int = 12) -> str:
 
 @router.get("/", response_model=List[UserResponse])
 async def list_users(
+    q: Optional[str] = Query(None, description="Filter by username or email substring"),
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """List all users (admin only)"""
-    users = db.query(User).all()
+    """List all users, optionally filtered (admin only)"""
+    # Only the serialized columns; password hashes never leave the database
+    query = select(*USER_RESPONSE_COLUMNS)
+    
+    if q:
+        # Escape LIKE wildcards; ILIKE '%...%' is served by the trigram indexes
+        pattern = "%" + q.replace("!", "!!").replace("%", "!%").replace("_", "!_") + "%"
+        query = query.where(or_(
+            User.username.ilike(pattern, escape="!"),
+            User.email.ilike(pattern, escape="!")
+        ))
+    
+    users = (await db.execute(query)).all()
     return [
         UserResponse(
             id=str(user.id),
@@ -66,11 +89,11 @@ async def list_users(
 async def create_user(
     user_data: UserCreate,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create new user (admin only)"""
     # Check if username already exists
-    existing_user = db.query(User).filter(User.username == user_data.username).first()
+    existing_user = await db.scalar(select(User).where(User.username == user_data.username))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -79,7 +102,7 @@ async def create_user(
     
     # Check if email already exists (if provided)
     if user_data.email:
-        existing_email = db.query(User).filter(User.email == user_data.email).first()
+        existing_email = await db.scalar(select(User).where(User.email == user_data.email))
         if existing_email:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -103,13 +126,13 @@ async def create_user(
         username=user_data.username,
         email=user_data.email,
         role=role,
-        password_hash=get_password_hash(temp_password),
+        password_hash=await aget_password_hash(temp_password),
         is_active=True
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     
     return UserResponse(
         id=str(new_user.id),
@@ -125,10 +148,12 @@ async def create_user(
 async def get_user(
     user_id: str,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get user by ID (admin only)"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = (await db.execute(
+        select(*USER_RESPONSE_COLUMNS).where(User.id == user_id)
+    )).first()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -150,10 +175,10 @@ async def update_user(
     user_id: str,
     user_data: UserUpdate,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update user (admin only)"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.scalar(select(User).where(User.id == user_id))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -162,7 +187,7 @@ async def update_user(
     
     # Check email uniqueness if changing email
     if user_data.email and user_data.email != user.email:
-        existing_email = db.query(User).filter(User.email == user_data.email).first()
+        existing_email = await db.scalar(select(User).where(User.email == user_data.email))
         if existing_email:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -184,8 +209,8 @@ async def update_user(
     if user_data.is_active is not None:
         user.is_active = user_data.is_active
     
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     
     return UserResponse(
         id=str(user.id),
@@ -202,10 +227,10 @@ async def reset_password(
     user_id: str,
     password_data: PasswordReset,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Reset user password (admin only)"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.scalar(select(User).where(User.id == user_id))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -214,9 +239,9 @@ async def reset_password(
     
     # Generate new password
     new_password = password_data.new_password or generate_temp_password()
-    user.password_hash = get_password_hash(new_password)
+    user.password_hash = await aget_password_hash(new_password)
     
-    db.commit()
+    await db.commit()
     
     return {
         "message": "Password reset successfully",
@@ -227,10 +252,10 @@ async def reset_password(
 async def delete_user(
     user_id: str,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete user (admin only)"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.scalar(select(User).where(User.id == user_id))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -244,7 +269,7 @@ async def delete_user(
             detail="Cannot delete your own account"
         )
     
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await db.commit()
     
     return {"message": "User deleted successfully"}
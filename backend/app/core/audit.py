@@ -1,25 +1,47 @@
 """
 Audit logging utilities
 """
-from typing import Optional
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
 from fastapi import Request
-from sqlalchemy.orm import Session
+from sqlalchemy import insert
 from app.models.audit import Audit, AuditAction
 from app.models.user import User
 from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+AUDIT_BATCH_SIZE = 100
+AUDIT_FLUSH_INTERVAL = 0.5  # seconds
+AUDIT_QUEUE_MAXSIZE = 10000
+AUDIT_WRITE_ATTEMPTS = 3
+AUDIT_RETRY_DELAY = 1.0  # seconds, multiplied by the attempt number
+
+# Entries waiting to be written by audit_flusher; None asks it to stop
+_audit_queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(maxsize=AUDIT_QUEUE_MAXSIZE)
+
+def _first_hop(header: str) -> str:
+    """First address of a comma-separated forwarding header"""
+    i = header.find(",")
+    return (header[:i] if i >= 0 else header).strip()
 
 def get_client_ip(request: Request) -> str:
     """Get client IP address from request"""
+    headers = request.headers
+    
     # Check for forwarded headers (reverse proxy)
-    forwarded_for = request.headers.get("X-Forwarded-For")
+    forwarded_for = headers.get("X-Forwarded-For")
     if forwarded_for:
-        return forwarded_for.split(",")[0].strip()
+        return _first_hop(forwarded_for)
     
-    forwarded = request.headers.get("X-Forwarded")
+    forwarded = headers.get("X-Forwarded")
     if forwarded:
-        return forwarded.split(",")[0].strip()
+        return _first_hop(forwarded)
     
-    real_ip = request.headers.get("X-Real-IP")
+    real_ip = headers.get("X-Real-IP")
     if real_ip:
         return real_ip
     
@@ -33,8 +55,7 @@ def get_user_agent(request: Request) -> str:
     """Get user agent from request"""
     return request.headers.get("User-Agent", "unknown")
 
-def log_audit(
-    db: Session,
+async def log_audit(
     user: User,
     action: AuditAction,
     request: Request,
@@ -42,38 +63,42 @@ def log_audit(
     doc_title: Optional[str] = None,
     details: Optional[str] = None
 ) -> None:
-    """Log an audit entry"""
-    audit = Audit(
-        user_id=user.id,
-        action=action,
-        doc_id=doc_id,
-        doc_title=doc_title,
-        ip_address=get_client_ip(request),
-        user_agent=get_user_agent(request),
-        details=details
-    )
-    
-    db.add(audit)
-    db.commit()
+    """Queue an audit entry for audit_flusher, or write it directly if the queue is full"""
+    entry = {
+        "user_id": user.id,
+        "username": user.username,
+        "action": action,
+        "doc_id": doc_id,
+        "doc_title": doc_title,
+        "ip_address": get_client_ip(request),
+        "user_agent": get_user_agent(request),
+        "details": details,
+        "created_at": datetime.now(timezone.utc)
+    }
+    try:
+        _audit_queue.put_nowait(entry)
+    except asyncio.QueueFull:
+        # The flusher is behind; this request waits for its own write instead
+        if not await _flush([entry], attempts=1):
+            logger.error(f"Failed to write {action.value} audit entry for {user.username}")
 
-def log_login(db: Session, user: User, request: Request) -> None:
+async def log_login(user: User, request: Request) -> None:
     """Log user login"""
-    log_audit(db, user, AuditAction.LOGIN, request)
+    await log_audit(user, AuditAction.LOGIN, request)
 
-def log_upload(db: Session, user: User, request: Request, doc_id: str, doc_title: str) -> None:
+async def log_upload(user: User, request: Request, doc_id: str, doc_title: str) -> None:
     """Log document upload"""
-    log_audit(db, user, AuditAction.UPLOAD, request, doc_id, doc_title)
+    await log_audit(user, AuditAction.UPLOAD, request, doc_id, doc_title)
 
-def log_download(db: Session, user: User, request: Request, doc_id: str, doc_title: str) -> None:
+async def log_download(user: User, request: Request, doc_id: str, doc_title: str) -> None:
     """Log document download"""
-    log_audit(db, user, AuditAction.DOWNLOAD, request, doc_id, doc_title)
+    await log_audit(user, AuditAction.DOWNLOAD, request, doc_id, doc_title)
 
-def log_search(db: Session, user: User, request: Request, query: str) -> None:
+async def log_search(user: User, request: Request, query: str) -> None:
     """Log search query"""
-    log_audit(db, user, AuditAction.SEARCH, request, details=f'query="{query}"')
+    await log_audit(user, AuditAction.SEARCH, request, details=f'query="{query}"')
 
-def log_user_action(
-    db: Session, 
+async def log_user_action(
     admin_user: User, 
     request: Request, 
     action: AuditAction, 
@@ -81,10 +106,92 @@ def log_user_action(
     details: Optional[str] = None
 ) -> None:
     """Log admin user management action"""
-    log_audit(
-        db, 
+    await log_audit(
         admin_user, 
         action, 
         request, 
         details=f'target="{target_username}"{f", {details}" if details else ""}'
     )
+
+async def _write_audits(batch: List[Dict[str, Any]]) -> None:
+    """Insert a batch of audit entries in one transaction"""
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(Audit), batch)
+        await db.commit()
+
+async def _flush(batch: List[Dict[str, Any]], attempts: int = AUDIT_WRITE_ATTEMPTS) -> bool:
+    """Write a batch, retrying transient failures; False if it could not be written"""
+    for attempt in range(1, attempts + 1):
+        try:
+            await _write_audits(batch)
+            return True
+        except Exception as e:
+            logger.warning(f"Writing {len(batch)} audit entries failed (attempt {attempt}/{attempts}): {e}")
+            if attempt < attempts:
+                await asyncio.sleep(AUDIT_RETRY_DELAY * attempt)
+    return False
+
+def _requeue(batch: List[Dict[str, Any]]) -> None:
+    """Put unwritten entries back for a later flush, as far as the queue has room"""
+    for i, entry in enumerate(batch):
+        try:
+            _audit_queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            logger.error(f"Audit queue full, dropped {len(batch) - i} unwritten entries")
+            return
+
+async def audit_flusher() -> None:
+    """Write queued audit entries in batches of up to AUDIT_BATCH_SIZE"""
+    loop = asyncio.get_running_loop()
+    batch: List[Dict[str, Any]] = []
+    try:
+        while True:
+            entry = await _audit_queue.get()
+            if entry is None:
+                return
+            batch = [entry]
+            stopping = False
+            deadline = loop.time() + AUDIT_FLUSH_INTERVAL
+            while len(batch) < AUDIT_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    entry = await asyncio.wait_for(_audit_queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if entry is None:
+                    stopping = True
+                    break
+                batch.append(entry)
+            
+            if not await _flush(batch):
+                _requeue(batch)
+            batch = []
+            if stopping:
+                return
+    except asyncio.CancelledError:
+        # Entries already taken off the queue would otherwise be lost
+        if batch and not await _flush(batch, attempts=1):
+            _requeue(batch)
+        raise
+
+async def stop_audit_flusher(task: "asyncio.Task[None]") -> None:
+    """Let audit_flusher write everything queued so far, then wait for it"""
+    if not task.done():
+        await _audit_queue.put(None)
+    try:
+        await task
+    except Exception as e:
+        logger.error(f"Audit flusher failed: {e}")
+
+async def drain_audit_queue() -> None:
+    """Write whatever is still queued (on shutdown)"""
+    batch = []
+    while not _audit_queue.empty():
+        entry = _audit_queue.get_nowait()
+        if entry is not None:
+            batch.append(entry)
+    
+    if batch and not await _flush(batch):
+        logger.error(f"Lost {len(batch)} audit entries on shutdown")
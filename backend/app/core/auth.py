@@ -1,13 +1,19 @@
 """
 Authentication and authorization utilities
 """
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional, Union
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from cachetools import TTLCache
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
 from app.core.database import get_db
 from app.models.user import User, UserRole
@@ -15,9 +21,16 @@ from app.models.user import User, UserRole
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt releases the GIL, so hashing threads run in parallel; the pool is
+# sized to the CPU count to cap how much CPU a burst of logins can take
+_HASH_POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="bcrypt")
+
 # JWT token scheme
 security = HTTPBearer(auto_error=False)
 
+# Decoded token payloads; only touched from the event loop, so no lock
+_token_cache: TTLCache = TTLCache(maxsize=8192, ttl=300)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -26,6 +39,16 @@ def get_password_hash(password: str) -> str:
     """Hash a password"""
     return pwd_context.hash(password)
 
+async def averify_password(plain_password: str, hashed_password: str) -> bool:
+    """verify_password without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_HASH_POOL, verify_password, plain_password, hashed_password)
+
+async def aget_password_hash(password: str) -> str:
+    """get_password_hash without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_HASH_POOL, get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token"""
     to_encode = data.copy()
@@ -39,32 +62,42 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 def verify_token(token: str) -> Optional[dict]:
-    """Verify JWT token and return payload"""
+    """Verify JWT token and return payload (cached, expiry still enforced)"""
+    payload = _token_cache.get(token)
+    if payload is not None:
+        exp = payload.get("exp")
+        if exp is None or exp >= time.time():
+            return payload
+        _token_cache.pop(token, None)
+        return None
+    
     try:
         payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
-        return payload
     except JWTError:
         return None
+    _token_cache[token] = payload
+    return payload
 
-def get_user_by_username(db: Session, username: str) -> Optional[User]:
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
     """Get user by username"""
-    return db.query(User).filter(User.username == username).first()
+    return await db.scalar(select(User).where(User.username == username))
 
-def authenticate_user(db: Session, username: str, password: str) -> Union[User, bool]:
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> Union[User, bool]:
     """Authenticate user with username and password"""
-    user = get_user_by_username(db, username)
-    if not user:
+    # Disabled accounts are filtered out in SQL, so they never reach bcrypt
+    user = await db.scalar(
+        select(User).where(User.username == username, User.is_active.is_(True))
+    )
+    if not user or not user.is_active:
         return False
-    if not verify_password(password, user.password_hash):
-        return False
-    if not user.is_active:
+    if not await averify_password(password, user.password_hash):
         return False
     return user
 
 async def get_current_user(
     request: Request,
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> User:
     """Get current authenticated user from JWT token"""
     
@@ -100,7 +133,7 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user = get_user_by_username(db, username=username)
+    user = await get_user_by_username(db, username=username)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -0,0 +1,46 @@
+"""
+Redis-backed response caching
+"""
+import hashlib
+import logging
+from typing import Any, Optional
+import orjson
+from redis.exceptions import RedisError
+
+from app.core.database import redis_client
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CACHE_PATTERNS = ("search:*", "suggest:*")
+
+def cache_key(prefix: str, *parts: Any) -> str:
+    """Build a fixed-length cache key from arbitrary request parameters"""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()
+    return f"{prefix}:{digest}"
+
+async def get_cached(key: str) -> Optional[Any]:
+    """Return the cached JSON value for key, None on miss or Redis error"""
+    try:
+        raw = await redis_client.get(key)
+    except RedisError as e:
+        logger.warning(f"Cache read failed for {key}: {e}")
+        return None
+    
+    return orjson.loads(raw) if raw is not None else None
+
+async def set_cached(key: str, value: Any, ttl: int) -> None:
+    """Store a JSON-serializable value for ttl seconds, ignoring Redis errors"""
+    try:
+        await redis_client.setex(key, ttl, orjson.dumps(value))
+    except RedisError as e:
+        logger.warning(f"Cache write failed for {key}: {e}")
+
+async def invalidate_search_cache() -> None:
+    """Drop all cached search and suggestion responses"""
+    try:
+        for pattern in SEARCH_CACHE_PATTERNS:
+            keys = [key async for key in redis_client.scan_iter(match=pattern)]
+            if keys:
+                await redis_client.delete(*keys)
+    except RedisError as e:
+        logger.warning(f"Search cache invalidation failed: {e}")
@@ -1,22 +1,29 @@
 """
 Database configuration and session management
 """
-from sqlalchemy import create_engine
+import asyncio
+from typing import AsyncGenerator
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
 from app.core.config import settings
-import redis
+import redis.asyncio as redis
 
-# PostgreSQL engine
-engine = create_engine(
+# PostgreSQL engine (psycopg 3 runs in async mode under create_async_engine)
+engine = create_async_engine(
     settings.POSTGRES_DSN,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_use_lifo=True,
     pool_pre_ping=True,
     pool_recycle=300,
     echo=settings.DEBUG
 )
 
-# Session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Session factory; instances stay loaded after commit since async sessions
+# cannot lazily refresh expired attributes
+AsyncSessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
 
 # Base class for models
 Base = declarative_base()
@@ -24,13 +31,19 @@ Base = declarative_base()
 # Redis connection
 redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
 
-def get_db() -> Session:
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """Get database session"""
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+async def warm_pool() -> None:
+    """Open pool_size connections up front so the first requests don't pay for connects"""
+    async def ping() -> None:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    
+    # Concurrent checkouts, so each ping holds its own connection
+    await asyncio.gather(*(ping() for _ in range(settings.DB_POOL_SIZE)))
 
 def get_redis():
     """Get Redis client"""
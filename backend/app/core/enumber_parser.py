@@ -2,45 +2,73 @@
 E-number parsing and normalization utilities
 """
 import re
-from typing import List, Optional, Tuple
+from functools import lru_cache
+from typing import ClassVar, List, Optional, Tuple
+
+# Canonical form produced by normalize_enumber: e13*1234*5678*00
+_CANONICAL_RE = re.compile(r'e(\d{2})\*(\d{4})\*(\d{4})\*(\d{2})')
+_CLEAN_RE = re.compile(r'[^\d\*\-eE\s]')
+
+# Only query-sized inputs are memoized; document bodies would bloat the cache
+_CACHE_MAX_TEXT_LEN = 256
 
 class ENumberParser:
     """Parser for E-approval numbers with tolerance for various formats"""
     
-    # Regex patterns for E-numbers
+    # Regex patterns for E-numbers, most specific first: the compact format
+    # must win over the looser patterns, which would split its digit run
     ENUMBER_PATTERNS = [
+        # Compact format: e131234567800
+        r'[eE](\d{2})(\d{4})(\d{4})(\d{2})',
         # Standard format: e13*1234*5678*00
         r'[eE](\d+)\*?(\d+)\*?(\d+)\*?(\d+)',
-        # Alternative with spaces/hyphens: e13-1234-5678-00
+        # Spaces/hyphens, also the simple format: e13-1234-5678-00, e13 1234 5678 00
         r'[eE](\d+)[\s\-]*(\d+)[\s\-]*(\d+)[\s\-]*(\d+)',
-        # Simple format: e13 1234 5678 00
-        r'[eE](\d+)\s+(\d+)\s+(\d+)\s+(\d+)',
-        # Compact format: e131234567800
-        r'[eE](\d{2})(\d{4})(\d{4})(\d{2})',
     ]
     
+    # All patterns fused into one alternation so the text is scanned once; the
+    # patterns spell out [eE] themselves, so no IGNORECASE case folding
+    _COMBINED_PATTERN: ClassVar[re.Pattern] = re.compile(
+        "|".join(f"(?:{p})" for p in ENUMBER_PATTERNS)
+    )
+    
+    @staticmethod
+    def _format_match(match: re.Match) -> str:
+        """Build the canonical E-number from a match of the combined pattern"""
+        # Each alternative has four groups; lastindex is the fourth group of
+        # whichever alternative matched
+        first = match.lastindex - 3
+        authority, base, ext, rev = match.group(first, first + 1, first + 2, first + 3)
+        
+        return f"e{authority.zfill(2)}*{base.zfill(4)}*{ext.zfill(4)}*{rev.zfill(2)}"
+    
     @classmethod
     def extract_enumbers(cls, text: str) -> List[str]:
         """Extract all E-numbers from text"""
-        if not text:
+        # Every pattern starts with e/E, so most plain-text queries skip the scan
+        if not text or ('e' not in text and 'E' not in text):
             return []
         
-        enumbers = set()
+        if len(text) <= _CACHE_MAX_TEXT_LEN:
+            return list(cls._extract_cached(text))
         
-        for pattern in cls.ENUMBER_PATTERNS:
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            for match in matches:
-                # Extract groups
-                authority = match.group(1).zfill(2)
-                base = match.group(2).zfill(4)
-                ext = match.group(3).zfill(4)
-                rev = match.group(4).zfill(2)
-                
-                # Create normalized E-number
-                enumber = f"e{authority}*{base}*{ext}*{rev}"
-                enumbers.add(enumber.lower())
+        return list(cls._extract(text))
+    
+    @classmethod
+    def _extract(cls, text: str) -> Tuple[str, ...]:
+        """Scan text once and return the distinct normalized E-numbers"""
+        enumbers = {
+            cls._format_match(match)
+            for match in cls._COMBINED_PATTERN.finditer(text)
+        }
         
-        return list(enumbers)
+        return tuple(enumbers)
+    
+    @classmethod
+    @lru_cache(maxsize=2048)
+    def _extract_cached(cls, text: str) -> Tuple[str, ...]:
+        """Memoized _extract for short, repeated inputs such as search queries"""
+        return cls._extract(text)
     
     @classmethod
     def normalize_enumber(cls, enumber: str) -> Optional[str]:
@@ -49,17 +77,11 @@ class ENumberParser:
             return None
         
         # Clean input
-        cleaned = re.sub(r'[^\d\*\-eE\s]', '', enumber.strip())
+        cleaned = _CLEAN_RE.sub('', enumber.strip())
         
-        for pattern in cls.ENUMBER_PATTERNS:
-            match = re.search(pattern, cleaned, re.IGNORECASE)
-            if match:
-                authority = match.group(1).zfill(2)
-                base = match.group(2).zfill(4)
-                ext = match.group(3).zfill(4)
-                rev = match.group(4).zfill(2)
-                
-                return f"e{authority}*{base}*{ext}*{rev}".lower()
+        match = cls._COMBINED_PATTERN.search(cleaned)
+        if match:
+            return cls._format_match(match)
         
         return None
     
@@ -70,8 +92,12 @@ class ENumberParser:
         if not normalized:
             return None
         
-        # Extract from normalized format e13*1234*5678*00
-        match = re.match(r'e(\d{2})\*(\d{4})\*(\d{4})\*(\d{2})', normalized)
+        return cls._parse_normalized(normalized)
+    
+    @staticmethod
+    def _parse_normalized(normalized: str) -> Optional[Tuple[int, int, int, int]]:
+        """Parse an E-number already in canonical format e13*1234*5678*00"""
+        match = _CANONICAL_RE.match(normalized)
         if match:
             return (
                 int(match.group(1)),  # authority
@@ -93,33 +119,31 @@ class ENumberParser:
         if not query_enumbers or not doc_enumbers:
             return False
         
-        # Normalize all E-numbers
-        norm_query = [cls.normalize_enumber(e) for e in query_enumbers if cls.normalize_enumber(e)]
-        norm_doc = [cls.normalize_enumber(e) for e in doc_enumbers if cls.normalize_enumber(e)]
+        # Index the document E-numbers once: exact values, and (authority, base)
+        # pairs for tolerance on extension/revision differences
+        doc_exact = set()
+        doc_authority_base = set()
+        for e in doc_enumbers:
+            normalized = cls.normalize_enumber(e)
+            if not normalized:
+                continue
+            doc_exact.add(normalized)
+            parts = cls._parse_normalized(normalized)
+            if parts:
+                doc_authority_base.add(parts[:2])
         
-        if not norm_query or not norm_doc:
+        if not doc_exact:
             return False
         
-        # Check for exact matches first
-        for q_e in norm_query:
-            if q_e in norm_doc:
-                return True
-        
-        # For fuzzy matching, we could implement more sophisticated algorithms
-        # For now, we'll do partial matching (e.g., match if authority and base are the same)
-        for q_e in norm_query:
-            q_parts = cls.parse_enumber(q_e)
-            if not q_parts:
+        for e in query_enumbers:
+            normalized = cls.normalize_enumber(e)
+            if not normalized:
                 continue
-            
-            for d_e in norm_doc:
-                d_parts = cls.parse_enumber(d_e)
-                if not d_parts:
-                    continue
-                
-                # Check if authority and base match (tolerance for extension/revision differences)
-                if q_parts[0] == d_parts[0] and q_parts[1] == d_parts[1]:
-                    return True
+            if normalized in doc_exact:
+                return True
+            parts = cls._parse_normalized(normalized)
+            if parts and parts[:2] in doc_authority_base:
+                return True
         
         return False
 
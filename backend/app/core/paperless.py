@@ -1,13 +1,89 @@
 """
 Paperless-ngx integration utilities
 """
+import asyncio
 import httpx
 import logging
-from typing import Optional, Dict, Any, List
+import orjson
+import secrets
+from cachetools import TTLCache
+from typing import Optional, Dict, Any, List, AsyncIterator, Tuple, Union
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Per-operation request timeouts in seconds; uploads of large PDFs get minutes
+HTTP_TIMEOUTS = {
+    "default": 30.0,
+    "upload": 300.0,
+    "search": 15.0,
+    "probe": 10.0,
+}
+
+class DocumentNotFoundError(Exception):
+    """Paperless has no document with the requested id"""
+
+def _multipart_envelope(
+    boundary: str,
+    fields: Dict[str, str],
+    filename: str
+) -> Tuple[bytes, bytes]:
+    """Encode form fields and the PDF part headers as multipart/form-data,
+    returning the bytes sent before and after the file body"""
+    parts = [
+        (
+            f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+            f'{value}\r\n'
+        )
+        for name, value in fields.items()
+    ]
+    
+    safe_filename = filename.replace('"', '%22').replace('\r', '').replace('\n', '')
+    parts.append(
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="document"; filename="{safe_filename}"\r\n'
+        f'Content-Type: application/pdf\r\n\r\n'
+    )
+    
+    return ''.join(parts).encode(), f'\r\n--{boundary}--\r\n'.encode()
+
+async def _multipart_stream(
+    head: bytes,
+    file_stream: AsyncIterator[bytes],
+    tail: bytes
+) -> AsyncIterator[bytes]:
+    """Wrap a PDF stream in its multipart envelope"""
+    yield head
+    async for chunk in file_stream:
+        yield chunk
+    yield tail
+
+def _without_content(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Document JSON minus the OCR text, which can be megabytes"""
+    if "content" not in doc:
+        return doc
+    return {k: v for k, v in doc.items() if k != "content"}
+
+class PaperlessStream:
+    """Chunked body of an open Paperless response, closed once consumed or on aclose()"""
+    
+    def __init__(self, response: httpx.Response):
+        self._response = response
+    
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in self._response.aiter_bytes(STREAM_CHUNK_SIZE):
+                yield chunk
+        finally:
+            await self.aclose()
+    
+    async def aclose(self) -> None:
+        """Return the upstream connection to the pool"""
+        await self._response.aclose()
+
 class PaperlessClient:
     """Client for Paperless-ngx API integration"""
     
@@ -16,20 +92,69 @@ class PaperlessClient:
         self.api_token = settings.PAPERLESS_API_TOKEN
         self.headers = {
             "Authorization": f"Token {self.api_token}",
-            "Accept": "application/json"
+            "Accept": "application/json",
+            # JSON responses compress well; httpx decodes transparently
+            "Accept-Encoding": "br, gzip"
         }
+        # Short-lived metadata cache without the OCR text; only touched from the
+        # event loop, so no lock
+        self._document_cache: TTLCache = TTLCache(
+            maxsize=settings.PAPERLESS_CACHE_SIZE,
+            ttl=settings.PAPERLESS_CACHE_TTL_SECONDS
+        )
+        # In-flight document fetches by doc id, see _load_document
+        self._pending: Dict[str, "asyncio.Future[Dict[str, Any]]"] = {}
+        # Shared connection pool, created on first use rather than at import
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Pooled HTTP client for the Paperless API"""
+        if self._client is None or self._client.is_closed:
+            # HTTP/2 is negotiated via ALPN on https; plain http stays on HTTP/1.1
+            self._client = httpx.AsyncClient(
+                http2=settings.PAPERLESS_HTTP2,
+                base_url=self.base_url,
+                headers=self.headers,
+                timeout=httpx.Timeout(HTTP_TIMEOUTS["default"]),
+                limits=httpx.Limits(
+                    max_connections=settings.PAPERLESS_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.PAPERLESS_MAX_KEEPALIVE,
+                    keepalive_expiry=settings.PAPERLESS_KEEPALIVE_EXPIRY_SECONDS
+                )
+            )
+        return self._client
+    
+    async def aclose(self) -> None:
+        """Close pooled connections (on shutdown)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    def invalidate_document(self, doc_id: Optional[str] = None) -> None:
+        """Drop cached metadata for one document, or for all documents"""
+        if doc_id is None:
+            self._document_cache.clear()
+            self._pending.clear()
+        else:
+            self._document_cache.pop(str(doc_id), None)
+            self._pending.pop(str(doc_id), None)
     
     async def upload_document(
         self, 
-        file_content: bytes, 
+        file_stream: AsyncIterator[bytes], 
         filename: str,
         title: Optional[str] = None,
-        tags: Optional[List[str]] = None
+        tags: Optional[List[str]] = None,
+        size: Optional[int] = None
     ) -> Dict[str, Any]:
-        """Upload document to Paperless"""
-        url = f"{self.base_url}/api/documents/post_document/"
+        """Upload document to Paperless, streaming the file body.
+        
+        With a known file size the request carries a Content-Length instead
+        of being sent with chunked transfer encoding.
+        """
+        url = "/api/documents/post_document/"
         
-        files = {"document": (filename, file_content, "application/pdf")}
         data = {}
         
         if title:
@@ -37,94 +162,151 @@ class PaperlessClient:
         if tags:
             data["tags"] = ",".join(tags)
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    url,
-                    files=files,
-                    data=data,
-                    headers=self.headers,
-                    timeout=300.0  # 5 minutes for large uploads
-                )
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPStatusError as e:
-                logger.error(f"Paperless upload failed: {e.response.status_code} - {e.response.text}")
-                raise Exception(f"Upload failed: {e.response.status_code}")
-            except Exception as e:
-                logger.error(f"Paperless upload error: {e}")
-                raise Exception(f"Upload error: {str(e)}")
+        boundary = secrets.token_hex(16)
+        head, tail = _multipart_envelope(boundary, data, filename)
+        headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+        if size is not None:
+            headers["Content-Length"] = str(len(head) + size + len(tail))
+        
+        try:
+            response = await self.client.post(
+                url,
+                content=_multipart_stream(head, file_stream, tail),
+                headers=headers,
+                timeout=HTTP_TIMEOUTS["upload"]
+            )
+            response.raise_for_status()
+            result = orjson.loads(response.content)
+            if isinstance(result, dict) and result.get("id") is not None:
+                self.invalidate_document(result["id"])
+            return result
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Paperless upload failed: {e.response.status_code} - {e.response.text}")
+            raise Exception(f"Upload failed: {e.response.status_code}")
+        except httpx.HTTPError as e:
+            # Errors raised by file_stream itself propagate unchanged
+            logger.error(f"Paperless upload error: {e}")
+            raise Exception(f"Upload error: {str(e)}")
     
     async def get_document(self, doc_id: str) -> Dict[str, Any]:
-        """Get document metadata from Paperless"""
-        url = f"{self.base_url}/api/documents/{doc_id}/"
+        """Get document metadata, without content, from Paperless (cached for a short TTL)"""
+        key = str(doc_id)
+        cached = self._document_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        return _without_content(await self._load_document(key))
+    
+    async def get_document_with_content(self, doc_id: str) -> Dict[str, Any]:
+        """Get document metadata and OCR text from Paperless (not cached)"""
+        return await self._load_document(str(doc_id))
+    
+    async def _load_document(self, key: str) -> Dict[str, Any]:
+        """Fetch a document, sharing one request between concurrent callers"""
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._fetch_document(key))
+            self._pending[key] = pending
+            pending.add_done_callback(lambda task: self._fetch_done(key, task))
+        return await asyncio.shield(pending)
+    
+    def _fetch_done(self, key: str, task: "asyncio.Future[Dict[str, Any]]") -> None:
+        """Cache a finished fetch unless the document was invalidated meanwhile"""
+        if self._pending.get(key) is task:
+            del self._pending[key]
+            if not task.cancelled() and task.exception() is None:
+                self._document_cache[key] = _without_content(task.result())
+        elif not task.cancelled():
+            task.exception()  # Mark retrieved; waiters already saw it
+    
+    async def _fetch_document(self, doc_id: str) -> Dict[str, Any]:
+        """Fetch document JSON (metadata and text content) from Paperless"""
+        url = f"/api/documents/{doc_id}/"
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(url, headers=self.headers)
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPStatusError as e:
-                logger.error(f"Paperless get document failed: {e.response.status_code}")
-                if e.response.status_code == 404:
-                    raise Exception("Document not found")
-                raise Exception(f"Failed to get document: {e.response.status_code}")
-            except Exception as e:
-                logger.error(f"Paperless get document error: {e}")
-                raise Exception(f"Error getting document: {str(e)}")
-    
-    async def download_document(self, doc_id: str) -> bytes:
-        """Download document content from Paperless"""
-        url = f"{self.base_url}/api/documents/{doc_id}/download/"
+        try:
+            response = await self.client.get(url)
+            response.raise_for_status()
+            return orjson.loads(response.content)
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Paperless get document failed: {e.response.status_code}")
+            if e.response.status_code == 404:
+                raise DocumentNotFoundError("Document not found")
+            raise Exception(f"Failed to get document: {e.response.status_code}")
+        except Exception as e:
+            logger.error(f"Paperless get document error: {e}")
+            raise Exception(f"Error getting document: {str(e)}")
+    
+    async def get_documents(
+        self,
+        doc_ids: List[str],
+        concurrency: int = 16,
+        with_content: bool = False
+    ) -> List[Union[Dict[str, Any], Exception]]:
+        """Get several documents concurrently, in doc_ids order"""
+        semaphore = asyncio.Semaphore(concurrency)
+        get = self.get_document_with_content if with_content else self.get_document
+        
+        async def fetch(doc_id: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await get(doc_id)
+        
+        return await asyncio.gather(
+            *(fetch(doc_id) for doc_id in doc_ids),
+            return_exceptions=True
+        )
+    
+    async def _open_stream(self, url: str) -> "PaperlessStream":
+        """Open a streamed GET, raising on error status before any body is read"""
+        client = self.client
+        # PDFs and thumbnails are already compressed, pass them through as is
+        request = client.build_request("GET", url, headers={"Accept-Encoding": "identity"})
+        response = await client.send(request, stream=True)
+        try:
+            response.raise_for_status()
+        except BaseException:
+            await response.aclose()
+            raise
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(url, headers=self.headers)
-                response.raise_for_status()
-                return response.content
-            except httpx.HTTPStatusError as e:
-                logger.error(f"Paperless download failed: {e.response.status_code}")
-                if e.response.status_code == 404:
-                    raise Exception("Document not found")
-                raise Exception(f"Download failed: {e.response.status_code}")
-            except Exception as e:
-                logger.error(f"Paperless download error: {e}")
-                raise Exception(f"Download error: {str(e)}")
-    
-    async def get_document_thumb(self, doc_id: str) -> Optional[bytes]:
-        """Get document thumbnail from Paperless"""
-        url = f"{self.base_url}/api/documents/{doc_id}/thumb/"
+        return PaperlessStream(response)
+    
+    async def stream_document(self, doc_id: str) -> "PaperlessStream":
+        """Stream document content from Paperless"""
+        url = f"/api/documents/{doc_id}/download/"
+        
+        try:
+            return await self._open_stream(url)
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Paperless download failed: {e.response.status_code}")
+            if e.response.status_code == 404:
+                raise Exception("Document not found")
+            raise Exception(f"Download failed: {e.response.status_code}")
+        except Exception as e:
+            logger.error(f"Paperless download error: {e}")
+            raise Exception(f"Download error: {str(e)}")
+    
+    async def stream_document_thumb(self, doc_id: str) -> Optional["PaperlessStream"]:
+        """Stream document thumbnail from Paperless"""
+        url = f"/api/documents/{doc_id}/thumb/"
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(url, headers=self.headers)
-                response.raise_for_status()
-                return response.content
-            except httpx.HTTPStatusError as e:
-                if e.response.status_code == 404:
-                    return None  # No thumbnail available
-                logger.error(f"Paperless thumbnail failed: {e.response.status_code}")
-                return None
-            except Exception as e:
-                logger.error(f"Paperless thumbnail error: {e}")
-                return None
+        try:
+            return await self._open_stream(url)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                return None  # No thumbnail available
+            logger.error(f"Paperless thumbnail failed: {e.response.status_code}")
+            return None
+        except Exception as e:
+            logger.error(f"Paperless thumbnail error: {e}")
+            return None
     
     async def get_document_content(self, doc_id: str) -> Optional[str]:
         """Get document text content from Paperless"""
-        url = f"{self.base_url}/api/documents/{doc_id}/"
-        
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(url, headers=self.headers)
-                response.raise_for_status()
-                data = response.json()
-                return data.get("content", "")
-            except httpx.HTTPStatusError as e:
-                logger.error(f"Paperless content failed: {e.response.status_code}")
-                return None
-            except Exception as e:
-                logger.error(f"Paperless content error: {e}")
-                return None
+        try:
+            doc = await self.get_document_with_content(doc_id)
+        except Exception as e:
+            logger.error(f"Paperless content error: {e}")
+            return None
+        return doc.get("content", "")
     
     async def search_documents(
         self, 
@@ -132,36 +314,34 @@ class PaperlessClient:
         limit: int = 50
     ) -> List[Dict[str, Any]]:
         """Search documents in Paperless"""
-        url = f"{self.base_url}/api/documents/"
+        url = "/api/documents/"
         params = {"page_size": limit}
         
         if query:
             params["search"] = query
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(url, params=params, headers=self.headers)
-                response.raise_for_status()
-                data = response.json()
-                return data.get("results", [])
-            except httpx.HTTPStatusError as e:
-                logger.error(f"Paperless search failed: {e.response.status_code}")
-                raise Exception(f"Search failed: {e.response.status_code}")
-            except Exception as e:
-                logger.error(f"Paperless search error: {e}")
-                raise Exception(f"Search error: {str(e)}")
+        try:
+            response = await self.client.get(url, params=params, timeout=HTTP_TIMEOUTS["search"])
+            response.raise_for_status()
+            data = orjson.loads(response.content)
+            return data.get("results", [])
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Paperless search failed: {e.response.status_code}")
+            raise Exception(f"Search failed: {e.response.status_code}")
+        except Exception as e:
+            logger.error(f"Paperless search error: {e}")
+            raise Exception(f"Search error: {str(e)}")
     
     async def test_connection(self) -> bool:
         """Test connection to Paperless API"""
-        url = f"{self.base_url}/api/documents/"
+        url = "/api/documents/"
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(url, headers=self.headers, timeout=10.0)
-                return response.status_code == 200
-            except Exception as e:
-                logger.error(f"Paperless connection test failed: {e}")
-                return False
+        try:
+            response = await self.client.get(url, timeout=HTTP_TIMEOUTS["probe"])
+            return response.status_code == 200
+        except Exception as e:
+            logger.error(f"Paperless connection test failed: {e}")
+            return False
 
 # Global client instance
 paperless_client = PaperlessClient()
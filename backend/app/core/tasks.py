@@ -0,0 +1,26 @@
+"""
+Background maintenance tasks
+"""
+import asyncio
+import logging
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+async def refresh_admin_stats() -> None:
+    """Refresh the admin dashboard statistics view"""
+    async with AsyncSessionLocal() as db:
+        await db.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_admin_stats"))
+        await db.commit()
+
+async def admin_stats_refresher() -> None:
+    """Periodically refresh admin statistics"""
+    while True:
+        try:
+            await refresh_admin_stats()
+        except Exception as e:
+            logger.error(f"Admin stats refresh failed: {e}")
+        await asyncio.sleep(settings.ADMIN_STATS_REFRESH_SECONDS)
@@ -4,18 +4,21 @@ ABE Portal Backend - FastAPI Application
 from fastapi import FastAPI, Request, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 import uvicorn
+import asyncio
 import logging
 
 from app.core.config import settings
-from app.core.database import engine, get_db
+from app.core.database import engine, warm_pool
 from app.core.auth import get_current_user, get_current_admin_user
+from app.core.tasks import admin_stats_refresher
+from app.core.audit import audit_flusher, stop_audit_flusher, drain_audit_queue
+from app.core.paperless import paperless_client
 from app.api.routes import auth, users, documents, search, admin, hooks
-from app.models import Base
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -28,6 +31,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/api/docs" if settings.DEBUG else None,
     redoc_url="/api/redoc" if settings.DEBUG else None,
+    default_response_class=ORJSONResponse,
 )
 
 # Rate limiting
@@ -61,10 +65,20 @@ app.include_router(hooks.router, prefix="/api/hooks", tags=["Hooks"])
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database tables on startup"""
+    """Start background tasks on startup; the schema is managed by alembic"""
     logger.info("Starting ABE Portal Backend...")
-    Base.metadata.create_all(bind=engine)
-    logger.info("Database tables initialized")
+    await warm_pool()
+    app.state.stats_task = asyncio.create_task(admin_stats_refresher())
+    app.state.audit_task = asyncio.create_task(audit_flusher())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background tasks and close pooled connections on shutdown"""
+    app.state.stats_task.cancel()
+    await stop_audit_flusher(app.state.audit_task)
+    await drain_audit_queue()
+    await paperless_client.aclose()
+    await engine.dispose()
 
 @app.get("/api/health")
 async def health_check():
@@ -75,10 +89,9 @@ async def health_check():
 async def status_check():
     """Status check with database connectivity"""
     try:
-        from app.core.database import get_db
-        db = next(get_db())
-        # Test database connection
-        db.execute("SELECT 1")
+        # Test database connection with a plain driver round trip
+        async with engine.connect() as conn:
+            await conn.exec_driver_sql("SELECT 1")
         return {
             "status": "healthy",
             "database": "connected",
@@ -110,6 +123,8 @@ if __name__ == "__main__":
         "app.main:app",
         host="0.0.0.0",
         port=8000,
+        loop="uvloop",
+        http="httptools",
         reload=settings.DEBUG,
         log_level="info"
     )
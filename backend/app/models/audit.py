@@ -1,7 +1,7 @@
 """
 Audit model for tracking user actions
 """
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Enum as SQLEnum
+from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Index, text, Enum as SQLEnum
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -26,8 +26,9 @@ class Audit(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    username = Column(String(50), nullable=True)  # Copied from users at insert time
     action = Column(SQLEnum(AuditAction), nullable=False)
-    doc_id = Column(String(255), nullable=True, index=True)  # Paperless document ID
+    doc_id = Column(String(255), nullable=True)  # Paperless document ID
     doc_title = Column(Text, nullable=True)
     ip_address = Column(String(45), nullable=True)  # IPv6 compatible
     user_agent = Column(Text, nullable=True)
@@ -37,5 +38,13 @@ class Audit(Base):
     # Relationship
     user = relationship("User", backref="audits")
     
+    # Indexes for paginated, newest-first queries
+    __table_args__ = (
+        Index('ix_audits_action_created', 'action', text('created_at DESC')),
+        Index('ix_audits_user_created', 'user_id', text('created_at DESC')),
+        Index('ix_audits_doc_created', 'doc_id', text('created_at DESC')),
+        Index('ix_audits_created', text('created_at DESC')),
+    )
+    
     def __repr__(self):
         return f"<Audit(user='{self.user_id}', action='{self.action}', doc='{self.doc_id}')>"
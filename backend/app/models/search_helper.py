@@ -1,7 +1,7 @@
 """
 Search helper model for enhanced search capabilities
 """
-from sqlalchemy import Column, String, DateTime, Text, Index
+from sqlalchemy import Column, String, DateTime, Text, Index, Computed
 from sqlalchemy.dialects.postgresql import UUID, ARRAY, TSVECTOR
 from sqlalchemy.sql import func
 import uuid
@@ -13,16 +13,29 @@ class SearchHelper(Base):
 
     doc_id = Column(String(255), primary_key=True)  # Paperless document ID
     title = Column(Text, nullable=False)
-    normalized_text = Column(TSVECTOR, nullable=True)  # Full-text search vector
+    normalized_text = Column(
+        TSVECTOR,
+        Computed(
+            "to_tsvector('simple', lower(immutable_unaccent(title)) || ' ' || title "
+            "|| ' ' || coalesce(content_excerpt, ''))",
+            persisted=True
+        )
+    )  # Full-text search vector over title and stored text, generated by PostgreSQL
     enumbers = Column(ARRAY(String), default=[], nullable=False)  # Extracted E-numbers
-    normalized_title = Column(Text, nullable=True)  # Normalized for trigram search
+    normalized_title = Column(
+        Text,
+        Computed("lower(immutable_unaccent(title))", persisted=True)
+    )  # Normalized for trigram search, generated by PostgreSQL
+    created_at = Column(DateTime(timezone=True), nullable=True)  # Paperless document created
+    modified_at = Column(DateTime(timezone=True), nullable=True)  # Paperless document modified
+    content_excerpt = Column(Text, nullable=True)  # Document text up to CONTENT_EXCERPT_CHARS, for matches and snippets
     last_seen_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     
     # Indexes for performance
     __table_args__ = (
         Index('ix_search_helpers_normalized_text', 'normalized_text', postgresql_using='gin'),
         Index('ix_search_helpers_enumbers', 'enumbers', postgresql_using='gin'),
-        Index('ix_search_helpers_normalized_title', 'normalized_title', postgresql_using='gin'),
+        Index('ix_search_helpers_normalized_title', 'normalized_title', postgresql_using='gin', postgresql_ops={'normalized_title': 'gin_trgm_ops'}),
         Index('ix_search_helpers_last_seen', 'last_seen_at'),
     )
     
@@ -1,7 +1,7 @@
 """
 Application settings model
 """
-from sqlalchemy import Column, String, Boolean, DateTime, Text
+from sqlalchemy import Column, String, Boolean, DateTime, Integer, Text
 from sqlalchemy.sql import func
 
 from app.core.database import Base
@@ -13,8 +13,8 @@ class Settings(Base):
     paperless_base_url = Column(String(500), nullable=True)
     paperless_api_token = Column(Text, nullable=True)
     allow_self_signup = Column(Boolean, default=False, nullable=False)
-    max_upload_mb = Column(String(10), default="50", nullable=False)
-    session_timeout_hours = Column(String(5), default="24", nullable=False)
+    max_upload_mb = Column(Integer, default=50, nullable=False)
+    session_timeout_hours = Column(Integer, default=24, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
     
@@ -1,7 +1,7 @@
 """
 User model
 """
-from sqlalchemy import Column, String, Boolean, DateTime, Enum as SQLEnum
+from sqlalchemy import Column, String, Boolean, DateTime, Index, Enum as SQLEnum
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 import uuid
@@ -25,5 +25,11 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     last_login_at = Column(DateTime(timezone=True), nullable=True)
     
+    # Trigram indexes for substring search in the admin UI
+    __table_args__ = (
+        Index('ix_users_username_trgm', 'username', postgresql_using='gin', postgresql_ops={'username': 'gin_trgm_ops'}),
+        Index('ix_users_email_trgm', 'email', postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'}),
+    )
+    
     def __repr__(self):
         return f"<User(username='{self.username}', role='{self.role}')>"
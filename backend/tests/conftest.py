@@ -0,0 +1,7 @@
+"""
+Shared test configuration
+"""
+from app.core.auth import pwd_context
+
+# Minimum bcrypt cost; hashes stay valid bcrypt, just cheap to build and check
+pwd_context.update(bcrypt__rounds=4)
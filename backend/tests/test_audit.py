@@ -0,0 +1,110 @@
+"""
+Tests for queued audit logging
+"""
+import asyncio
+import pytest
+from unittest.mock import Mock
+from app.core import audit
+from app.models.audit import AuditAction
+
+
+@pytest.fixture
+def written(monkeypatch):
+    """Fresh audit queue with writes captured instead of sent to the database"""
+    rows = []
+
+    async def fake_write(batch):
+        rows.extend(batch)
+
+    monkeypatch.setattr(audit, "_audit_queue", asyncio.Queue())
+    monkeypatch.setattr(audit, "_write_audits", fake_write)
+    return rows
+
+
+@pytest.fixture
+def request_mock():
+    """Request object with client address and headers"""
+    request = Mock()
+    request.headers = {"User-Agent": "pytest"}
+    request.client.host = "127.0.0.1"
+    return request
+
+
+@pytest.fixture
+def user():
+    """User writing the audit entries"""
+    return Mock(id="test-id", username="testuser")
+
+
+class TestAuditFlusher:
+    """Test that shutdown writes every queued audit entry"""
+
+    @pytest.mark.asyncio
+    async def test_entry_logged_before_shutdown_is_written(self, written, request_mock, user):
+        """Test an entry still in the flusher's batch window is written on stop"""
+        task = asyncio.create_task(audit.audit_flusher())
+        await asyncio.sleep(0)
+
+        await audit.log_audit(user, AuditAction.LOGIN, request_mock)
+        await asyncio.sleep(0.05)  # Flusher holds the entry in its batch
+
+        await audit.stop_audit_flusher(task)
+        await audit.drain_audit_queue()
+
+        assert task.done()
+        assert [row["action"] for row in written] == [AuditAction.LOGIN]
+        assert written[0]["username"] == "testuser"
+
+    @pytest.mark.asyncio
+    async def test_cancelled_flusher_writes_pending_batch(self, written, request_mock, user):
+        """Test cancelling the flusher still writes the entries it already took"""
+        task = asyncio.create_task(audit.audit_flusher())
+        await asyncio.sleep(0)
+
+        await audit.log_login(user, request_mock)
+        await asyncio.sleep(0.05)
+
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert [row["action"] for row in written] == [AuditAction.LOGIN]
+
+    @pytest.mark.asyncio
+    async def test_drain_writes_remaining_entries(self, written, request_mock, user):
+        """Test entries queued after the flusher stopped are written by the drain"""
+        await audit.log_login(user, request_mock)
+        await audit.log_search(user, request_mock, "e13")
+
+        await audit.drain_audit_queue()
+
+        assert [row["action"] for row in written] == [AuditAction.LOGIN, AuditAction.SEARCH]
+
+    @pytest.mark.asyncio
+    async def test_full_queue_writes_entry_directly(self, written, monkeypatch, request_mock, user):
+        """Test an entry that does not fit in the queue is written by the caller"""
+        monkeypatch.setattr(audit, "_audit_queue", asyncio.Queue(maxsize=1))
+
+        await audit.log_login(user, request_mock)
+        await audit.log_search(user, request_mock, "e13")
+
+        assert [row["action"] for row in written] == [AuditAction.SEARCH]
+        assert audit._audit_queue.qsize() == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_write_is_retried(self, written, monkeypatch, request_mock, user):
+        """Test a batch whose first write fails is written on retry, not dropped"""
+        failures = [RuntimeError("database unavailable")]
+
+        async def flaky_write(batch):
+            if failures:
+                raise failures.pop()
+            written.extend(batch)
+
+        monkeypatch.setattr(audit, "_write_audits", flaky_write)
+        monkeypatch.setattr(audit, "AUDIT_RETRY_DELAY", 0)
+
+        await audit.log_login(user, request_mock)
+        await audit.drain_audit_queue()
+
+        assert [row["action"] for row in written] == [AuditAction.LOGIN]
@@ -3,7 +3,7 @@ Tests for authentication functionality
 """
 import pytest
 from datetime import datetime, timedelta
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 from app.core.auth import (
     verify_password,
     get_password_hash,
@@ -75,6 +75,15 @@ class TestJWTToken:
         
         assert payload is None
 
+    def test_verify_token_cached_expires(self):
+        """Test cached token payloads are rejected once expired"""
+        token = create_access_token({"sub": "testuser"}, timedelta(minutes=5))
+        payload = verify_token(token)
+        assert payload is not None
+        
+        with patch("app.core.auth.time.time", return_value=payload["exp"] + 1):
+            assert verify_token(token) is None
+
     def test_verify_token_expired(self):
         """Test token verification with expired token"""
         data = {"sub": "testuser"}
@@ -96,7 +105,9 @@ class TestAuthentication:
     @pytest.fixture
     def mock_db(self):
         """Mock database session"""
-        return Mock()
+        db = Mock()
+        db.scalar = AsyncMock()
+        return db
 
     @pytest.fixture
     def test_user(self):
@@ -109,33 +120,37 @@ class TestAuthentication:
             is_active=True
         )
 
-    def test_authenticate_user_valid(self, mock_db, test_user):
+    @pytest.mark.asyncio
+    async def test_authenticate_user_valid(self, mock_db, test_user):
         """Test authentication with valid credentials"""
-        mock_db.query.return_value.filter.return_value.first.return_value = test_user
+        mock_db.scalar.return_value = test_user
         
-        result = authenticate_user(mock_db, "testuser", "test_password")
+        result = await authenticate_user(mock_db, "testuser", "test_password")
         assert result == test_user
 
-    def test_authenticate_user_invalid_password(self, mock_db, test_user):
+    @pytest.mark.asyncio
+    async def test_authenticate_user_invalid_password(self, mock_db, test_user):
         """Test authentication with invalid password"""
-        mock_db.query.return_value.filter.return_value.first.return_value = test_user
+        mock_db.scalar.return_value = test_user
         
-        result = authenticate_user(mock_db, "testuser", "wrong_password")
+        result = await authenticate_user(mock_db, "testuser", "wrong_password")
         assert result is False
 
-    def test_authenticate_user_nonexistent(self, mock_db):
+    @pytest.mark.asyncio
+    async def test_authenticate_user_nonexistent(self, mock_db):
         """Test authentication with nonexistent user"""
-        mock_db.query.return_value.filter.return_value.first.return_value = None
+        mock_db.scalar.return_value = None
         
-        result = authenticate_user(mock_db, "nonexistent", "password")
+        result = await authenticate_user(mock_db, "nonexistent", "password")
         assert result is False
 
-    def test_authenticate_user_inactive(self, mock_db, test_user):
+    @pytest.mark.asyncio
+    async def test_authenticate_user_inactive(self, mock_db, test_user):
         """Test authentication with inactive user"""
         test_user.is_active = False
-        mock_db.query.return_value.filter.return_value.first.return_value = test_user
+        mock_db.scalar.return_value = test_user
         
-        result = authenticate_user(mock_db, "testuser", "test_password")
+        result = await authenticate_user(mock_db, "testuser", "test_password")
         assert result is False
 
 
@@ -153,7 +168,9 @@ class TestGetCurrentUser:
     @pytest.fixture
     def mock_db(self):
         """Mock database session"""
-        return Mock()
+        db = Mock()
+        db.scalar = AsyncMock()
+        return db
 
     @pytest.fixture
     def test_user(self):
@@ -171,7 +188,7 @@ class TestGetCurrentUser:
         """Test get_current_user with valid token"""
         token = create_access_token({"sub": "testuser"})
         mock_request.cookies = {"access_token": token}
-        mock_db.query.return_value.filter.return_value.first.return_value = test_user
+        mock_db.scalar.return_value = test_user
         
         # Mock the dependency injection
         with patch('app.core.auth.get_db', return_value=iter([mock_db])):
@@ -203,7 +220,7 @@ class TestGetCurrentUser:
         """Test get_current_user with nonexistent user"""
         token = create_access_token({"sub": "nonexistent"})
         mock_request.cookies = {"access_token": token}
-        mock_db.query.return_value.filter.return_value.first.return_value = None
+        mock_db.scalar.return_value = None
         
         with patch('app.core.auth.get_db', return_value=iter([mock_db])):
             with pytest.raises(HTTPException) as exc_info:
@@ -217,7 +234,7 @@ class TestGetCurrentUser:
         test_user.is_active = False
         token = create_access_token({"sub": "testuser"})
         mock_request.cookies = {"access_token": token}
-        mock_db.query.return_value.filter.return_value.first.return_value = test_user
+        mock_db.scalar.return_value = test_user
         
         with patch('app.core.auth.get_db', return_value=iter([mock_db])):
             with pytest.raises(HTTPException) as exc_info:
@@ -0,0 +1,182 @@
+"""
+Tests for the Paperless-ngx client
+"""
+import asyncio
+import httpx
+import pytest
+from email.parser import BytesParser
+from email.policy import HTTP
+from app.core.paperless import PaperlessClient, DocumentNotFoundError
+
+
+def make_client(handler) -> PaperlessClient:
+    """PaperlessClient whose pooled client is served by handler"""
+    client = PaperlessClient()
+    client._client = httpx.AsyncClient(
+        base_url=client.base_url,
+        headers=client.headers,
+        transport=httpx.MockTransport(handler)
+    )
+    return client
+
+
+async def file_chunks(*chunks: bytes):
+    """Async iterator over upload chunks"""
+    for chunk in chunks:
+        yield chunk
+
+
+class TestUploadDocument:
+    """Test the streamed multipart upload"""
+
+    @pytest.fixture
+    def captured(self):
+        """Requests seen by the mock Paperless server, with their bodies"""
+        return []
+
+    @pytest.fixture
+    def client(self, captured):
+        """Client recording each upload request"""
+        async def handler(request: httpx.Request) -> httpx.Response:
+            captured.append((request, await request.aread()))
+            return httpx.Response(200, json={"id": 42})
+
+        return make_client(handler)
+
+    def parse_multipart(self, request: httpx.Request, body: bytes):
+        """Parse a multipart/form-data body into its parts"""
+        header = f"Content-Type: {request.headers['Content-Type']}\r\n\r\n".encode()
+        message = BytesParser(policy=HTTP).parsebytes(header + body)
+        assert message.is_multipart()
+        return list(message.iter_parts())
+
+    @pytest.mark.asyncio
+    async def test_upload_with_size_sets_exact_content_length(self, client, captured):
+        """Test a known size produces a Content-Length matching the body"""
+        pdf = [b"%PDF-1.4\n" + b"a" * 70000, b"b" * 1234, b"\n%%EOF"]
+        size = sum(len(chunk) for chunk in pdf)
+
+        result = await client.upload_document(
+            file_chunks(*pdf), "report.pdf", title="Report", tags=["1", "2"], size=size
+        )
+
+        assert result == {"id": 42}
+        request, body = captured[0]
+        assert int(request.headers["Content-Length"]) == len(body)
+        assert "Transfer-Encoding" not in request.headers
+
+        parts = self.parse_multipart(request, body)
+        fields = {part.get_param("name", header="content-disposition"): part for part in parts}
+        assert fields["title"].get_payload(decode=True) == b"Report"
+        assert fields["tags"].get_payload(decode=True) == b"1,2"
+        document = fields["document"]
+        assert document.get_filename() == "report.pdf"
+        assert document.get_content_type() == "application/pdf"
+        assert document.get_payload(decode=True) == b"".join(pdf)
+
+    @pytest.mark.asyncio
+    async def test_upload_without_size_is_chunked(self, client, captured):
+        """Test an unknown size falls back to chunked transfer encoding"""
+        await client.upload_document(file_chunks(b"%PDF", b"-1.4"), "a.pdf")
+
+        request, body = captured[0]
+        assert "Content-Length" not in request.headers
+        assert request.headers["Transfer-Encoding"] == "chunked"
+
+        parts = self.parse_multipart(request, body)
+        assert [part.get_filename() for part in parts] == ["a.pdf"]
+        assert parts[0].get_payload(decode=True) == b"%PDF-1.4"
+
+
+class TestGetDocumentSingleFlight:
+    """Test that concurrent metadata lookups share one upstream request"""
+
+    @pytest.fixture
+    def upstream(self):
+        """Mock Paperless that holds each request until released"""
+        state = {"calls": 0, "entered": asyncio.Event(), "release": asyncio.Event()}
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            state["calls"] += 1
+            state["entered"].set()
+            await state["release"].wait()
+            return httpx.Response(200, json={
+                "id": 7, "title": f"Version {state['calls']}", "content": "OCR text"
+            })
+
+        state["client"] = make_client(handler)
+        return state
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_fetch_once(self, upstream):
+        """Test N concurrent cache misses issue a single request"""
+        client = upstream["client"]
+        waiters = asyncio.gather(*(client.get_document("7") for _ in range(10)))
+        await upstream["entered"].wait()
+        upstream["release"].set()
+
+        docs = await waiters
+
+        assert upstream["calls"] == 1
+        assert all(doc == {"id": 7, "title": "Version 1"} for doc in docs)
+        assert client._pending == {}
+        assert await client.get_document("7") == docs[0]
+        assert upstream["calls"] == 1
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_poison_pending(self, upstream):
+        """Test cancelling one caller leaves the shared fetch to finish and be cached"""
+        client = upstream["client"]
+        cancelled = asyncio.ensure_future(client.get_document("7"))
+        await upstream["entered"].wait()
+        other = asyncio.ensure_future(client.get_document("7"))
+        await asyncio.sleep(0)
+
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        upstream["release"].set()
+
+        assert await other == {"id": 7, "title": "Version 1"}
+        await asyncio.sleep(0)
+        assert client._pending == {}
+        assert await client.get_document("7") == {"id": 7, "title": "Version 1"}
+        assert upstream["calls"] == 1
+
+    @pytest.mark.asyncio
+    async def test_invalidate_during_fetch_does_not_cache_stale_data(self, upstream):
+        """Test a fetch that finishes after invalidate_document is not cached"""
+        client = upstream["client"]
+        stale = asyncio.ensure_future(client.get_document("7"))
+        await upstream["entered"].wait()
+
+        client.invalidate_document("7")
+        upstream["release"].set()
+
+        assert await stale == {"id": 7, "title": "Version 1"}
+        await asyncio.sleep(0)
+        assert "7" not in client._document_cache
+        assert await client.get_document("7") == {"id": 7, "title": "Version 2"}
+        assert upstream["calls"] == 2
+
+
+class TestGetDocumentErrors:
+    """Test a missing document is told apart from other upstream failures"""
+
+    @pytest.mark.asyncio
+    async def test_missing_document_raises_not_found(self):
+        """Test a 404 raises DocumentNotFoundError"""
+        client = make_client(lambda request: httpx.Response(404))
+
+        with pytest.raises(DocumentNotFoundError):
+            await client.get_document_with_content("7")
+
+    @pytest.mark.asyncio
+    async def test_server_error_is_not_reported_as_missing(self):
+        """Test a 5xx raises a generic error rather than DocumentNotFoundError"""
+        client = make_client(lambda request: httpx.Response(503))
+
+        with pytest.raises(Exception) as exc_info:
+            await client.get_document_with_content("7")
+
+        assert not isinstance(exc_info.value, DocumentNotFoundError)